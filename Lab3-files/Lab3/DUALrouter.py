@@ -0,0 +1,292 @@
+from collections import defaultdict
+from router import Router
+from packet import Packet
+from json import dumps, loads
+
+class DUALrouter(Router):
+    """Diffusing update (DUAL-style) distance vector routing and forwarding implementation.
+
+       A route only moves locally to a neighbor that satisfies the feasibility condition
+       (its reported distance is below our feasible distance): the cheapest such feasible
+       successor. Only when there is none is the route frozen on its old next hop while a
+       diffusing computation (queries/replies) finds the new optimum, so routing loops and
+       count-to-infinity cannot form. A feasible successor can be dearer than a neighbor
+       that fails the condition; such routes are moved to the optimum by a diffusing
+       computation at the next heartbeat, while traffic keeps flowing on the loop-free route.
+    """
+
+    UPDATE = "update"
+    QUERY = "query"
+    REPLY = "reply"
+
+    def __init__(self, addr, heartbeatTime, infinity):
+        Router.__init__(self, addr, heartbeatTime)
+        self.infinity = int(infinity)
+        self.routingTable = {}      # dest -> (distance, successor)
+        self.feasibleDist = {}      # dest -> feasible distance
+        self.Nebhr2Port = {}
+        self.port2nbr = {}
+        self.nbrCost = {}
+        self.nbrVectors = {}        # nbr -> {dest: reported distance}
+        self.peers = set()          # neighbors that speak the protocol (clients never reply)
+        self.active = {}            # dest -> set of neighbors we still wait on for a reply
+        self.deferred = defaultdict(set)  # dest -> neighbors whose query is answered when we go passive
+        self.routingTable[self.addr] = (0, self.addr)
+        self.feasibleDist[self.addr] = 0
+
+
+    def reported(self, nbr, dest):
+        """Distance to 'dest' last reported by neighbor 'nbr'"""
+        return self.nbrVectors.get(nbr, {}).get(dest, self.infinity)
+
+
+    def via(self, nbr, dest):
+        """Our distance to 'dest' if we used neighbor 'nbr' as next hop"""
+        return min(self.infinity, self.nbrCost[nbr] + self.reported(nbr, dest))
+
+
+    def distance(self, dest):
+        return self.routingTable.get(dest, (self.infinity, None))[0]
+
+
+    def send_msg(self, nbr, kind, dists):
+        """Send an update/query/reply carrying {dest: distance} to one neighbor"""
+        port = self.Nebhr2Port.get(nbr)
+        if port is None or not dists:
+            return
+        pkt = Packet(Packet.CONTROL, self.addr, nbr, dumps({"type": kind, "dist": dists}))
+        self.send(port, pkt)
+
+
+    def send_update(self, dists, nbrs=None):
+        for n in list(self.Nebhr2Port.keys()) if nbrs is None else nbrs:
+            self.send_msg(n, DUALrouter.UPDATE, dists)
+
+
+    def full_vector(self):
+        return {dest: min(self.infinity, cost) for dest, (cost, _) in self.routingTable.items()}
+
+
+    def evaluate(self, dest, queryFrom=None, replies=None):
+        """Local computation for a passive 'dest' after one of its inputs changed.
+           Returns True if our advertised distance changed. A reply owed to 'queryFrom'
+           is appended to 'replies' unless it has to wait for a diffusing computation.
+        """
+        oldCost, oldSucc = self.routingTable.get(dest, (self.infinity, None))
+        fd = self.feasibleDist.get(dest, self.infinity)
+
+        # switch locally to the cheapest feasible successor, if there is one
+        minCost = min([self.via(n, dest) for n in self.nbrCost] + [self.infinity])
+        feasible = None
+        for n in self.nbrCost:
+            if self.reported(n, dest) < fd:
+                c = self.via(n, dest)
+                if c < self.infinity and (feasible is None or c < feasible[0]):
+                    feasible = (c, n)
+
+        if feasible is not None:
+            self.routingTable[dest] = feasible
+            self.feasibleDist[dest] = min(fd, feasible[0])
+            if queryFrom is not None and replies is not None:
+                replies.append((queryFrom, dest, feasible[0]))
+            return feasible[0] != oldCost
+
+        if oldCost >= self.infinity and minCost >= self.infinity:
+            # already unreachable, nothing to diffuse
+            self.routingTable[dest] = (self.infinity, None)
+            self.feasibleDist[dest] = self.infinity
+            if queryFrom is not None and replies is not None:
+                replies.append((queryFrom, dest, self.infinity))
+            return False
+
+        # no feasible successor: go active, forwarding on the frozen successor meanwhile
+        succ = oldSucc
+        cost = self.via(oldSucc, dest) if oldSucc in self.nbrCost else self.infinity
+        self.routingTable[dest] = (cost, succ)
+        if queryFrom is not None:
+            if queryFrom == oldSucc:
+                self.deferred[dest].add(queryFrom)
+            elif replies is not None:
+                replies.append((queryFrom, dest, cost))
+        # a querying successor is active itself: its reply would repeat the distance it queried with
+        self.diffuse(dest, cost, answered=queryFrom if queryFrom == oldSucc else None)
+        return False
+
+
+    def diffuse(self, dest, cost, answered=None):
+        """Go active for 'dest': query every peer but 'answered' with our current distance 'cost'"""
+        self.active[dest] = self.peers & set(self.nbrCost.keys()) - {answered}
+        for n in list(self.active[dest]):
+            self.send_msg(n, DUALrouter.QUERY, {dest: cost})
+        if not self.active[dest]:
+            self.go_passive(dest)
+
+
+    def go_passive(self, dest):
+        """All replies are in: pick the best neighbor, reset FD and answer deferred queries"""
+        self.active.pop(dest, None)
+        oldCost = self.distance(dest)
+        best = (self.infinity, None)
+        for n in self.nbrCost:
+            c = self.via(n, dest)
+            if c < best[0]:
+                best = (c, n)
+        self.routingTable[dest] = best
+        self.feasibleDist[dest] = best[0]
+        for n in self.deferred.pop(dest, set()):
+            self.send_msg(n, DUALrouter.REPLY, {dest: best[0]})
+        if best[0] != oldCost:
+            self.send_update({dest: best[0]})
+
+
+    def got_reply(self, nbr, dest):
+        pending = self.active.get(dest)
+        if pending is None:
+            return
+        pending.discard(nbr)
+        if not pending:
+            self.go_passive(dest)
+
+
+    def handlePacket(self, port, packet):
+        """Process incoming packet.
+           This method is called whenever router receives a packet (CONTROL or DATA).
+
+           Parameters:
+           port : the router port on which the packet was received
+           packet : the received packet
+        """
+
+        if packet.isControl():
+            try:
+                msg = loads(packet.content)
+                kind, dists = msg["type"], msg["dist"]
+            except:
+                return
+
+            src = packet.srcAddr
+            if src not in self.nbrCost:
+                return
+            self.peers.add(src)
+            vec = self.nbrVectors.setdefault(src, {})
+
+            changed = {}
+            replies = []
+            for dest, d in dists.items():
+                d = min(self.infinity, int(d))
+                prev = vec.get(dest)
+                vec[dest] = d
+                if dest == self.addr:
+                    if kind == DUALrouter.QUERY:
+                        replies.append((src, dest, 0))
+                    continue
+
+                if kind == DUALrouter.REPLY:
+                    self.got_reply(src, dest)
+                    continue
+
+                if dest in self.active:
+                    if kind == DUALrouter.QUERY:
+                        # our own path goes through the querier, we cannot offer it an alternative
+                        succ = self.routingTable.get(dest, (None, None))[1]
+                        replies.append((src, dest, self.infinity if succ == src else self.distance(dest)))
+                    continue
+
+                if kind == DUALrouter.QUERY:
+                    if self.evaluate(dest, queryFrom=src, replies=replies):
+                        changed[dest] = self.distance(dest)
+                elif prev != d or dest not in self.routingTable:
+                    if self.evaluate(dest):
+                        changed[dest] = self.distance(dest)
+
+            for n, dest, d in replies:
+                self.send_msg(n, DUALrouter.REPLY, {dest: d})
+            if changed:
+                self.send_update(changed)
+
+        elif packet.isData():
+            outPort = self.forwardingPort(packet.dstAddr)
+            if outPort is None:
+                return
+            self.send(outPort, packet)
+        else:
+            pass
+
+
+    def forwardingPort(self, dstAddr):
+        """Port to forward DATA packets for 'dstAddr' on, None if there is no usable route"""
+        data = self.routingTable.get(dstAddr)
+        if data is None or data[0] >= self.infinity:
+            return None
+        return self.Nebhr2Port.get(data[1])
+
+
+    def handleNewLink(self, port, endpoint, cost):
+        """This method is called whenever a new link (including each of the initial links in the json file)
+           is added to a router port, or an existing link cost is updated.
+           The 'links' data structure in router.py has already been updated with this change.
+           Implement any routing/forwarding action that you might want to take under such a scenario.
+
+           Parameters:
+           port : router port of the new link / the existing link whose cost has been updated
+           endpoint : the node at the other end of the new link / the exisitng link whose cost has been updated
+           cost : cost of the new link / updated cost of the exisitng link
+        """
+        self.port2nbr[port] = endpoint
+        self.Nebhr2Port[endpoint] = port
+        self.nbrCost[endpoint] = int(cost)
+        self.nbrVectors.setdefault(endpoint, {})[endpoint] = 0
+
+        self.send_msg(endpoint, DUALrouter.UPDATE, self.full_vector())
+
+        changed = {}
+        for dest in set(self.routingTable) | {endpoint}:
+            if dest == self.addr or dest in self.active:
+                continue
+            if self.evaluate(dest):
+                changed[dest] = self.distance(dest)
+        if changed:
+            self.send_update(changed)
+
+
+    def handleRemoveLink(self, port, endpoint):
+        """This method is called whenever an existing link is removed from the router port.
+           The 'links' data structure in router.py has already been updated with this change.
+           Implement any routing/forwarding action that you might want to take under such a scenario.
+
+           Parameters:
+           port : router port from which the link has been removed
+           endpoint : the node at the other end of the removed link
+        """
+        self.port2nbr.pop(port, None)
+        self.Nebhr2Port.pop(endpoint, None)
+        self.nbrCost.pop(endpoint, None)
+        self.nbrVectors.pop(endpoint, None)
+        self.peers.discard(endpoint)
+
+        # a lost neighbor can no longer reply: count it as an infinite reply
+        for dest in list(self.active.keys()):
+            self.deferred[dest].discard(endpoint)
+            self.got_reply(endpoint, dest)
+
+        changed = {}
+        for dest, (c, nh) in list(self.routingTable.items()):
+            if nh == endpoint and dest not in self.active:
+                if self.evaluate(dest):
+                    changed[dest] = self.distance(dest)
+        if changed:
+            self.send_update(changed)
+
+
+    def handlePeriodicOps(self):
+        """Handle periodic operations. This method is called every 'heartbeatTime'.
+           The value of 'heartbeatTime' is specified in the json file.
+           Passive routes held on a feasible successor while a cheaper neighbor fails the
+           feasibility condition start a diffusing computation, which resets the feasible distance.
+        """
+        for dest, (cost, succ) in list(self.routingTable.items()):
+            if dest == self.addr or dest in self.active:
+                continue
+            if min([self.via(n, dest) for n in self.nbrCost] + [self.infinity]) < cost:
+                self.diffuse(dest, cost)
+        self.send_update(self.full_vector())
@@ -74,16 +74,8 @@ class DVrouter(Router):
                 for n in self.Nebhr2Port.keys():
                     self.send_vector_to(n)
 
-        elif packet.isData():  
-            packetDst = packet.dstAddr
-            data = self.routingTable.get(packetDst)
-            if data is None:
-                return
-
-            if data[0] >= self.infinity:
-                return
-            
-            outPort = self.Nebhr2Port.get(data[1])
+        elif packet.isData():
+            outPort = self.forwardingPort(packet.dstAddr)
             if outPort is None:
                 return
             self.send(outPort, packet)
@@ -91,6 +83,14 @@ class DVrouter(Router):
             pass
 
 
+    def forwardingPort(self, dstAddr):
+        """Port to forward DATA packets for 'dstAddr' on, None if there is no usable route"""
+        data = self.routingTable.get(dstAddr)
+        if data is None or data[0] >= self.infinity:
+            return None
+        return self.Nebhr2Port.get(data[1])
+
+
     def handleNewLink(self, port, endpoint, cost):
         """This method is called whenever a new link (including each of the initial links in the json file)
            is added to a router port, or an existing link cost is updated.
@@ -0,0 +1,182 @@
+import math
+import json
+import time
+import random
+from collections import defaultdict
+
+class ChurnScheduler:
+    """Applies link changes to a Network in batches and records per-event convergence metrics.
+
+       Events use the format of the "changes" list in the json file, times in scenario units:
+         [time, [addr1, addr2, p1, p2, cost(, params)], "up"]
+         [time, [addr1, addr2], "down"]
+         [time, [addr1, addr2, cost], "cost"]
+       Events with the same time are applied together as one batch. After each batch the
+       routers' forwarding state is polled until the next batch to measure convergence.
+
+       Optional 'params' (the "churn" entry of the json file): poll and quiet periods in
+       scenario units, and a "report" path for the per-event metrics as json.
+    """
+
+    def __init__(self, network, events, params=None):
+        params = params or {}
+        self.network = network
+        self.pollTime = params.get("poll", 0.5) * network.latencyMultiplier        # ms between snapshots
+        self.quietTime = params.get("quiet", 3) * network.latencyMultiplier        # ms without change to call it converged
+        self.reportPath = params.get("report")
+        self.batches = self.makeBatches(events)
+        self.metrics = []
+        self.ignored = 0
+        self.keepRunning = True
+
+
+    def makeBatches(self, events):
+        """Group events by time. Returns a time-sorted list of (time, [(target, change), ...])"""
+        byTime = defaultdict(list)
+        for changeTime, target, change in events:
+            if change not in ("up", "down", "cost"):
+                raise ValueError("Unknown link change: " + str(change))
+            byTime[changeTime].append((target, change))
+        return sorted(byTime.items(), key=lambda item: item[0])
+
+
+    def snapshot(self):
+        """Forwarding port of every router towards every node"""
+        net = self.network
+        dsts = list(net.routers.keys()) + list(net.clients.keys())
+        return {(addr, dst): router.forwardingPort(dst) for addr, router in net.routers.items() for dst in dsts}
+
+
+    def applyEvent(self, target, change):
+        """Apply one link change. Returns False if it does not match the current topology"""
+        net = self.network
+        addr1, addr2 = target[0], target[1]
+        if change == "up":
+            p1, p2, c = target[2:5]
+            link = net.makeLink(addr1, addr2, c, target[5] if len(target) > 5 else None)
+            net.links[(addr1,addr2)] = (p1, p2, c, link)
+        elif (addr1, addr2) not in net.links:
+            return False
+        elif change == "down":
+            p1, p2, _, link = net.links.pop((addr1, addr2))
+            for addr, p in ((addr1, p1), (addr2, p2)):
+                if addr in net.routers:
+                    net.routers[addr].changeLink(("remove", p))
+            return True
+        else:
+            p1, p2, _, link = net.links[(addr1, addr2)]
+            c = target[2]
+            link.cost = c
+            link.changeLatency(addr1, c)
+            net.links[(addr1,addr2)] = (p1, p2, c, link)
+        for addr, p, other in ((addr1, p1, addr2), (addr2, p2, addr1)):
+            if addr in net.routers:
+                net.routers[addr].changeLink(("add", p, other, link, c))
+            elif addr in net.clients:
+                net.clients[addr].changeLink(("add", link))
+        return True
+
+
+    def observe(self, batchStart, deadline):
+        """Poll forwarding state until 'deadline' (ms). Returns (ms to last change, number of changes, converged)"""
+        prev = self.snapshot()
+        lastChange, changes = 0.0, 0
+        while self.keepRunning:
+            now = time.time() * 1000
+            if now >= deadline:
+                break
+            time.sleep(min(self.pollTime, deadline - now) / float(1000))
+            snap = self.snapshot()
+            if snap != prev:
+                lastChange = time.time() * 1000 - batchStart
+                changes += 1
+                prev = snap
+        observed = time.time() * 1000 - batchStart
+        return lastChange, changes, observed - lastChange >= self.quietTime
+
+
+    def run(self, endTime):
+        """Apply all batches in time order; observe convergence after each one until the next or 'endTime' (ms)"""
+        startTime = time.time() * 1000
+        for i, (changeTime, events) in enumerate(self.batches):
+            batchStart = changeTime * self.network.latencyMultiplier + startTime
+            while self.keepRunning and time.time() * 1000 < batchStart:
+                time.sleep(min(self.pollTime, batchStart - time.time() * 1000) / float(1000))
+            if not self.keepRunning:
+                return
+            batchStart = time.time() * 1000
+            applied = [(target, change) for target, change in events if self.applyEvent(target, change)]
+            self.ignored += len(events) - len(applied)
+            if i + 1 < len(self.batches):
+                deadline = self.batches[i + 1][0] * self.network.latencyMultiplier + startTime
+            else:
+                deadline = startTime + endTime
+            convergence, changes, converged = self.observe(batchStart, deadline)
+            for target, change in applied:
+                self.metrics.append({"time": changeTime, "change": change, "link": target[0] + "-" + target[1],
+                                     "batchSize": len(applied), "convergenceMs": round(convergence, 1),
+                                     "routeChanges": changes, "converged": converged})
+
+
+    def stop(self):
+        self.keepRunning = False
+
+
+    def getReportString(self):
+        """Summary of the convergence metrics; also writes them to 'report' if configured"""
+        if self.reportPath:
+            with open(self.reportPath, "w") as f:
+                json.dump({"events": self.metrics, "ignored": self.ignored}, f, indent=1)
+        lines = ["Events applied: {} in {} batches ({} ignored)".format(len(self.metrics),
+                 len(set(m["time"] for m in self.metrics)), self.ignored)]
+        for change in ("up", "down", "cost"):
+            times = sorted(m["convergenceMs"] for m in self.metrics if m["change"] == change)
+            if not times:
+                continue
+            unconverged = sum(1 for m in self.metrics if m["change"] == change and not m["converged"])
+            lines.append("{:<5} n={:<6} mean={:.0f}ms p95={:.0f}ms max={:.0f}ms unconverged={}".format(change,
+                len(times), sum(times) / len(times), times[min(len(times) - 1, math.ceil(0.95 * len(times)) - 1)], times[-1], unconverged))
+        return "\n".join(lines)
+
+
+def loadEvents(churnParams, links, routers):
+    """Events described by the "churn" entry of the json file: a file of events and/or a generated flap process"""
+    events = []
+    if "file" in churnParams:
+        with open(churnParams["file"]) as f:
+            data = json.load(f)
+        events += data["events"] if isinstance(data, dict) else data
+    if "flap" in churnParams:
+        events += generateFlaps(churnParams["flap"], links, routers)
+    return events
+
+
+def generateFlaps(params, links, routers):
+    """On/off flap process per link: exponential up time with mean 1/'rate' and down time with mean 'meanDown'.
+       Every flapped link is back up at 'stop', so the scenario's correctRoutes still apply afterwards.
+
+       params  : rate, meanDown, start, stop, granularity (scenario units), seed,
+                 and optionally "links": [[addr1, addr2], ...] (default: every router-router link)
+       links   : the network's initial links {(addr1, addr2): (p1, p2, cost, link)}
+       routers : router addresses
+    """
+    rng = random.Random(params.get("seed"))
+    rate = float(params.get("rate", 0.01))
+    meanDown = float(params.get("meanDown", 20))
+    granularity = float(params.get("granularity", 1))
+    start = params.get("start", 0)
+    stop = params["stop"]
+    targets = [tuple(t) for t in params.get("links", [])]
+    if not targets:
+        targets = [(a1, a2) for a1, a2 in links if a1 in routers and a2 in routers]
+    quantize = lambda t: round(round(t / granularity) * granularity, 6)
+    events = []
+    for addr1, addr2 in targets:
+        p1, p2, c, _ = links[(addr1, addr2)]
+        t = start + rng.expovariate(rate)
+        while t < stop:
+            events.append([quantize(t), [addr1, addr2], "down"])
+            t += rng.expovariate(1.0 / meanDown)
+            events.append([quantize(min(t, stop)), [addr1, addr2, p1, p2, c], "up"])
+            t += rng.expovariate(rate)
+    return events
@@ -3,12 +3,15 @@ import time
 import sys
 import queue
 from packet import Packet
+from traffic import FlowStats, isLoadPacket
 
 class Client:
     """Client class sends periodic DATA packets"""
 
-    def __init__(self, addr, allClients, sendRate, updateFunction):
-        """Inititalize parameters"""
+    def __init__(self, addr, allClients, sendRate, updateFunction, flows=None):
+        """Inititalize parameters.
+           'flows' are the TrafficFlow load generators whose source is this client.
+        """
         self.addr = addr
         self.allClients = allClients
         self.sendRate = sendRate
@@ -21,7 +24,10 @@ class Client:
         self.keepRunning = True
         self.counter = 0
         self.f = open("logs/Client-"+self.addr+".dump", "w")
-        self.recvdPkts = []
+        self.recvdPkts = set()
+        self.flows = flows or []
+        self.flowStats = {}     # src -> FlowStats of load packets received from src
+        self.startTime = None
 
 
     def changeLink(self, change):
@@ -33,6 +39,17 @@ class Client:
 
     def handleRecvdPacket(self, packet):
         """log recvd packets. If it's a DATA packet, update the network object with its route"""
+        if isLoadPacket(packet):
+            if packet.dstAddr == self.addr:
+                if packet.srcAddr not in self.flowStats:
+                    self.flowStats[packet.srcAddr] = FlowStats()
+                self.flowStats[packet.srcAddr].record(packet.content, int(round(time.time() * 1000)))
+            self.f.write("Recvd LOAD packet (" + packet.srcAddr + "->" + packet.dstAddr + " len=" + str(len(packet.content)) + ")")
+            if packet.dstAddr != self.addr:
+                self.f.write(" -- WRONG DST!!")
+            self.f.write("\n")
+            return
+
         if packet.kind == Packet.DATA and int(packet.content) == 1000000:
             self.updateFunction(packet.srcAddr, packet.dstAddr, packet.route, int(packet.content))
 
@@ -51,7 +68,7 @@ class Client:
             if s in self.recvdPkts:
                 self.f.write(" -- DUP PKT!!")
             else:
-                self.recvdPkts.append(s)
+                self.recvdPkts.add(s)
 
         self.f.write("\n")
 
@@ -69,11 +86,23 @@ class Client:
                     self.link.send(packet, self.addr)
 
 
+    def sendLoadPackets(self, timeMillisecs):
+        """Send the traffic matrix packets that are due"""
+        for flow in self.flows:
+            for packet in flow.due(timeMillisecs, self.startTime):
+                if self.link:
+                    self.link.send(packet, self.addr)
+
+
     def handleTime(self, timeMillisecs):
         """Send DATA packets regularly"""
+        if self.startTime is None:
+            self.startTime = timeMillisecs
         if self.sending and (timeMillisecs - self.lastTime > self.sendRate):
             self.sendDataPackets()
             self.lastTime = timeMillisecs
+        if self.sending and self.link:
+            self.sendLoadPackets(timeMillisecs)
 
 
     def runClient(self):
@@ -89,8 +118,9 @@ class Client:
                 pass
             if self.link:
                 packet = self.link.recv(self.addr)
-                if packet:
+                while packet:
                     self.handleRecvdPacket(packet)
+                    packet = self.link.recv(self.addr)
             self.handleTime(timeMillisecs)
 
 
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import queue
+import tempfile
+from DVrouter import DVrouter
+from DUALrouter import DUALrouter
+
+# -------------------------------------------------------------------
+#  Compare how many rounds DVrouter and DUALrouter need to re-converge
+#  after a link failure. Routers are driven synchronously: one round
+#  delivers every packet that was sent in the previous round, so the
+#  numbers are independent of thread scheduling and latencies.
+#
+#  Usage: python compareConvergence.py [scenario.json ...]
+# -------------------------------------------------------------------
+ROUTER_CLASSES = {"DV": DVrouter, "DUAL": DUALrouter}
+
+HEARTBEAT_ROUNDS = 10   # handlePeriodicOps() is called every this many rounds
+HORIZON = 400           # rounds simulated after each event
+
+
+class RoundLink:
+    """Drop-in replacement for Link that delivers packets one round after they are sent"""
+
+    def __init__(self, e1, e2, cost):
+        self.q12 = queue.Queue()
+        self.q21 = queue.Queue()
+        self.staged12 = []
+        self.staged21 = []
+        self.cost = cost
+        self.e1 = e1
+        self.e2 = e2
+
+
+    def get_e2(self, e1):
+        return self.e2 if self.e1 == e1 else self.e1
+
+
+    def get_cost(self):
+        return self.cost
+
+
+    def send(self, packet, src):
+        if src == self.e1:
+            self.staged12.append(packet.copy())
+        elif src == self.e2:
+            self.staged21.append(packet.copy())
+
+
+    def recv(self, dst, timeout=None):
+        q = self.q21 if dst == self.e1 else self.q12
+        try:
+            return q.get_nowait()
+        except queue.Empty:
+            return None
+
+
+    def deliver(self):
+        """Move packets sent during the last round onto the receive queues"""
+        for p in self.staged12:
+            self.q12.put(p)
+        for p in self.staged21:
+            self.q21.put(p)
+        self.staged12 = []
+        self.staged21 = []
+
+
+class RoundNetwork:
+    """Routers and RoundLinks of one scenario, stepped a round at a time"""
+
+    def __init__(self, netJson, routerClass):
+        self.routers = {addr: routerClass(addr, 0, netJson["infinity"]) for addr in netJson["routers"]}
+        self.links = {}
+        self.round = 0
+        self.messages = 0
+        for params in netJson["links"]:
+            self.up(*params[:5])
+
+
+    def up(self, addr1, addr2, p1, p2, c):
+        link = RoundLink(addr1, addr2, c)
+        self.links[(addr1, addr2)] = (p1, p2, c, link)
+        if addr1 in self.routers:
+            self.routers[addr1].addLink(p1, addr2, link, c)
+        if addr2 in self.routers:
+            self.routers[addr2].addLink(p2, addr1, link, c)
+
+
+    def down(self, addr1, addr2):
+        p1, p2, _, link = self.links.pop((addr1, addr2))
+        if addr1 in self.routers:
+            self.routers[addr1].removeLink(p1)
+        if addr2 in self.routers:
+            self.routers[addr2].removeLink(p2)
+
+
+    def snapshot(self):
+        return {addr: dict(r.routingTable) for addr, r in self.routers.items()}
+
+
+    def step(self):
+        self.round += 1
+        for _, _, _, link in self.links.values():
+            link.deliver()
+        for router in self.routers.values():
+            for port, link in list(router.links.items()):
+                packet = link.recv(router.addr)
+                while packet:
+                    if packet.isControl():
+                        self.messages += 1
+                    router.handlePacket(port, packet)
+                    packet = link.recv(router.addr)
+        if self.round % HEARTBEAT_ROUNDS == 0:
+            for router in self.routers.values():
+                router.handlePeriodicOps()
+
+
+    def settle(self, event=None, horizon=HORIZON):
+        """Apply 'event' (a callable, e.g. a link failure) and run 'horizon' rounds.
+           Returns (rounds until the last routing table change, control messages
+           received up to that round). 0 rounds means the change was repaired locally.
+        """
+        prev = self.snapshot()
+        if event:
+            event()
+        start = self.messages
+        last, lastMsgs = 0, 0
+        for i in range(1, horizon + 1):
+            self.step()
+            snap = self.snapshot()
+            if snap != prev:
+                last, lastMsgs = i, self.messages - start
+                prev = snap
+        return last, lastMsgs
+
+
+def final_costs(net):
+    return {addr: {d: c for d, (c, _) in r.routingTable.items() if c < r.infinity}
+            for addr, r in net.routers.items()}
+
+
+def failure_cases(netJson):
+    """Every router-router link of the scenario"""
+    cases = []
+    for addr1, addr2 in (params[:2] for params in netJson["links"]):
+        if addr1 in netJson["routers"] and addr2 in netJson["routers"]:
+            cases.append((addr1, addr2))
+    return cases
+
+
+def compare(path):
+    with open(path) as f:
+        netJson = json.load(f)
+    rows = []
+    for addr1, addr2 in failure_cases(netJson):
+        row = {"link": addr1 + "-" + addr2}
+        costs = {}
+        for name, routerClass in ROUTER_CLASSES.items():
+            net = RoundNetwork(netJson, routerClass)
+            net.settle()
+            rounds, msgs = net.settle(lambda: net.down(addr1, addr2))
+            row[name] = (rounds, msgs)
+            costs[name] = final_costs(net)
+        row["agree"] = costs["DV"] == costs["DUAL"]
+        rows.append(row)
+    return rows
+
+
+def main():
+    paths = [os.path.abspath(p) for p in sys.argv[1:] or ["01.json", "02.json", "03.json"]]
+    # routers open their dump files under logs/, keep those out of the real logs directory
+    os.chdir(tempfile.mkdtemp())
+    os.mkdir("logs")
+    print("%-10s %-6s %10s %10s %10s %10s %6s" % ("Scenario", "Down", "DV rnds", "DUAL rnds", "DV msgs", "DUAL msgs", "Agree"))
+    totals = {name: 0 for name in ROUTER_CLASSES}
+    for path in paths:
+        for row in compare(path):
+            print("%-10s %-6s %10d %10d %10d %10d %6s" % (os.path.basename(path), row["link"], row["DV"][0], row["DUAL"][0],
+                                                        row["DV"][1], row["DUAL"][1], row["agree"]))
+            for name in ROUTER_CLASSES:
+                totals[name] += row[name][0]
+    print("\nTotal rounds to re-converge: " + ", ".join(name + "=" + str(n) for name, n in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,38 @@ import _thread
 import sys
 import queue
 import time
+import random
 import threading
+from collections import deque
+
+class LinkDirection:
+    """Transmitter state and counters for one direction of a link"""
+
+    def __init__(self):
+        self.busyUntil = 0.0    # time at which the last queued packet finishes serialization
+        self.backlog = deque()  # serialization finish times of packets still in the buffer
+        self.avgQueue = 0.0     # RED moving average of the buffer depth
+        self.busyTime = 0.0     # total seconds spent serializing
+        self.sentPkts = 0
+        self.sentBytes = 0
+        self.drops = 0
+        self.highWater = 0
+
 
 class Link:
     """Link class implements the link between two routers/clients.
-       Handles sending and receiving packets using threadsafe queues
+       Handles sending and receiving packets using threadsafe queues.
+
+       Optional 'params' (the 6th element of a link entry in the json file) shape the link:
+         bandwidth : serialization rate in bytes/sec of packet content (default: infinite)
+         buffer    : packets each direction can hold while waiting to be serialized (default: unbounded)
+         policy    : "droptail" (default) or "red"
+         minTh, maxTh, maxP, weight : RED thresholds (packets), max drop probability and averaging weight
+         seed      : seed of the link's RED drop draws (default: derived from the endpoint addresses)
+       A buffer or RED needs a bandwidth: without one packets are never held, so nothing queues.
     """
 
-    def __init__(self, e1, e2, l, latency):
+    def __init__(self, e1, e2, l, latency, params=None):
         """Create queues. e1 & e2 are addresses of the 2 endpoints of the link"""
         self.q12 = queue.Queue()
         self.q21 = queue.Queue()
@@ -21,6 +45,33 @@ class Link:
         self.e2 = e2
         self.endtimereached = 0
 
+        params = params or {}
+        self.params = params
+        self.bandwidth = params.get("bandwidth")
+        self.buffer = params.get("buffer")
+        self.policy = params.get("policy", "droptail")
+        if self.policy not in ("droptail", "red"):
+            raise ValueError("Unknown drop policy: " + str(self.policy))
+        if self.bandwidth is None and (self.buffer is not None or self.policy == "red"):
+            raise ValueError("Link " + e1 + "-" + e2 + ": 'buffer' and the red policy need a 'bandwidth'")
+        if self.buffer is not None:
+            self.minTh = params.get("minTh", self.buffer / 4.0)
+            self.maxTh = params.get("maxTh", self.buffer * 3 / 4.0)
+        else:
+            self.minTh = params.get("minTh", 5)
+            self.maxTh = params.get("maxTh", 15)
+        self.maxP = params.get("maxP", 0.1)
+        self.weight = params.get("weight", 0.2)
+        self.rng = random.Random(params.get("seed", e1 + "-" + e2))
+        self.directions = {e1: LinkDirection(), e2: LinkDirection()}
+        self.lock = threading.Lock()
+        self.created = time.time()
+
+
+    def isShaped(self):
+        """Returns True if the link models bandwidth or buffering"""
+        return self.bandwidth is not None or self.buffer is not None
+
 
     def get_e2(self, e1):
         """Returns the other endpoint of the link"""
@@ -35,16 +86,83 @@ class Link:
         return self.cost
 
 
-    def send_helper(self, packet, src):
+    def shouldDrop(self, d, depth):
+        """Drop decision for a packet arriving at a buffer currently holding 'depth' packets"""
+        if self.buffer is not None and depth >= self.buffer:
+            return True
+        if self.policy == "red":
+            d.avgQueue = (1 - self.weight) * d.avgQueue + self.weight * depth
+            if d.avgQueue >= self.maxTh:
+                return True
+            if d.avgQueue > self.minTh:
+                p = self.maxP * (d.avgQueue - self.minTh) / (self.maxTh - self.minTh)
+                return self.rng.random() < p
+        return False
+
+
+    def schedule(self, packet, src):
+        """Queue 'packet' for serialization from 'src'.
+           Returns the delay in seconds until it arrives at the other end, or None if it was dropped.
+        """
+        latency = self.l/float(1000)
+        d = self.directions.get(src)
+        if d is None:
+            return latency
+        now = time.time()
+        size = len(packet.content) if packet.content else 0
+        with self.lock:
+            while d.backlog and d.backlog[0] <= now:
+                d.backlog.popleft()
+            if self.shouldDrop(d, len(d.backlog)):
+                d.drops += 1
+                return None
+            txTime = size / float(self.bandwidth) if self.bandwidth else 0.0
+            d.busyUntil = max(now, d.busyUntil) + txTime
+            d.busyTime += txTime
+            if self.bandwidth:
+                d.backlog.append(d.busyUntil)
+                d.highWater = max(d.highWater, len(d.backlog))
+            d.sentPkts += 1
+            d.sentBytes += size
+            return (d.busyUntil - now) + latency
+
+
+    def getStats(self):
+        """Per-direction counters, keyed by "src->dst" """
+        now = time.time()
+        elapsed = max(now - self.created, 1e-9)
+        stats = {}
+        with self.lock:
+            for src, d in self.directions.items():
+                busy = d.busyTime - max(0.0, d.busyUntil - now)
+                stats[src + "->" + self.get_e2(src)] = {
+                    "utilization": max(0.0, busy) / elapsed,
+                    "sentPkts": d.sentPkts,
+                    "sentBytes": d.sentBytes,
+                    "drops": d.drops,
+                    "highWater": d.highWater,
+                }
+        return stats
+
+
+    def drainTime(self):
+        """Seconds until every packet queued on the link so far has arrived at the other end"""
+        now = time.time()
+        with self.lock:
+            backlog = max([d.busyUntil - now for d in self.directions.values()] + [0.0])
+        return backlog + self.l/float(1000)
+
+
+    def send_helper(self, packet, src, delay):
         """Runs in a separate thread and sends packet on link from src after waiting for the appropriate latency"""
         if src == self.e1:
-            time.sleep(self.l/float(1000))
+            time.sleep(delay)
             if self.endtimereached and packet.content != "1000000":
                 pass
             else:
                 self.q12.put(packet)
         elif src == self.e2:
-            time.sleep(self.l/float(1000))
+            time.sleep(delay)
             if self.endtimereached and packet.content != "1000000":
                 pass
             else:
@@ -59,7 +177,10 @@ class Link:
         if packet.content:
             assert isinstance((packet.content), str), "Packet content must be a string"
         p = packet.copy()
-        _thread.start_new_thread(self.send_helper, (p, src))
+        delay = self.schedule(p, src)
+        if delay is None:
+            return
+        _thread.start_new_thread(self.send_helper, (p, src, delay))
 
 
     def recv(self, dst, timeout=None):
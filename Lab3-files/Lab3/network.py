@@ -9,16 +9,21 @@ import os.path
 import queue
 from collections import defaultdict
 from client import Client
+from traffic import TrafficFlow, isLoadPacket
+from churn import ChurnScheduler, loadEvents
 from link import Link
 from router import Router
 
 class Network:
     """Network class maintains all clients, routers, links, and confguration"""
 
-    def __init__(self, netJsonFilepath, routerClass):
+    def __init__(self, netJsonFilepath, routerClass, analytic=False):
         """Create a new network from the parameters in the file at 'netJsonFilepath'.
            'routerClass' determines whether to use DVrouter, LSrouter, or the default Router.
+           If 'analytic' is set, final routes are verified by walking the routers' forwarding
+           state instead of sending a last batch of DATA packets.
         """
+        self.analytic = analytic
 
         # parse configuration details
         netJsonFile = open(netJsonFilepath, 'r')
@@ -28,22 +33,22 @@ class Network:
         self.endTime = netJson["endTime"] * self.latencyMultiplier
         self.clientSendRate = netJson["clientSendRate"]*self.latencyMultiplier
         self.infinity = netJson["infinity"]
+        self.linkDefaults = netJson.get("linkDefaults", {})
 
-        # parse and create routers, clients, and links
+        # parse the traffic matrix and create routers, clients, and links
+        self.flows = self.parseTraffic(netJson.get("traffic", []))
         self.routers = self.parserouters(netJson["routers"], routerClass)
         self.clients = self.parseClients(netJson["clients"], self.clientSendRate)
         self.links = self.parseLinks(netJson["links"])
 
-        # parse link changes
-        if "changes" in netJson:
-            self.changes = self.parseChanges(netJson["changes"])
-        else:
-            self.changes = None
+        # parse link changes, scripted and churn-generated
+        self.changes = self.parseChanges(netJson.get("changes", []), netJson.get("churn"))
 
         # parse correct routes and create some tracking fields
         self.threads = []
         self.routes = {}
         self.correctRoutes = self.parseCorrectRoutes(netJson["correctRoutes"])
+        self.routeFaults = {}
         self.routesLock = threading.Lock()
         netJsonFile.close()
 
@@ -52,7 +57,7 @@ class Network:
         """Parse routers from 'routerParams' dict"""
         routers = {}
         for addr in routerParams:
-            if sys.argv[2] == "DV":
+            if sys.argv[2] in ("DV", "DUAL"):
                 routers[addr] = routerClass(addr, self.heartbeatTime, self.infinity)
             else:
                 routers[addr] = routerClass(addr, self.heartbeatTime)
@@ -63,25 +68,43 @@ class Network:
         """Parse clients from 'clientParams' dict"""
         clients = {}
         for addr in clientParams:
-            clients[addr] = Client(addr, clientParams, clientSendRate, self.updateRoute)
+            flows = [flow for flow in self.flows if flow.src == addr]
+            clients[addr] = Client(addr, clientParams, clientSendRate, self.updateRoute, flows)
         return clients
 
 
+    def parseTraffic(self, trafficParams):
+        """Parse the traffic matrix from 'trafficParams' list of per-pair flow dicts"""
+        return [TrafficFlow(params, self.latencyMultiplier) for params in trafficParams]
+
+
     def parseLinks(self, linkParams):
         """Parse links from 'linkParams' dict"""
         links = {}
-        for addr1, addr2, p1, p2, c in linkParams:
-            link = Link(addr1, addr2, c, self.latencyMultiplier)
+        for params in linkParams:
+            addr1, addr2, p1, p2, c = params[:5]
+            link = self.makeLink(addr1, addr2, c, params[5] if len(params) > 5 else None)
             links[(addr1,addr2)] = (p1, p2, c, link)
         return links
 
 
-    def parseChanges(self, changesParams):
-        """Parse link changes from 'changesParams' dict"""
-        changes = queue.PriorityQueue()
-        for change in changesParams:
-            changes.put(change)
-        return changes
+    def makeLink(self, addr1, addr2, c, params=None):
+        """Create a link, applying per-link bandwidth/buffer/policy settings over 'linkDefaults'"""
+        linkParams = dict(self.linkDefaults)
+        linkParams.update(params or {})
+        return Link(addr1, addr2, c, self.latencyMultiplier, linkParams)
+
+
+    def parseChanges(self, changesParams, churnParams=None):
+        """Parse link changes from 'changesParams' list and the optional 'churnParams' dict.
+           Returns a ChurnScheduler, or None if there are no changes.
+        """
+        events = list(changesParams)
+        if churnParams:
+            events += loadEvents(churnParams, self.links, self.routers)
+        if not events:
+            return None
+        return ChurnScheduler(self, events, churnParams)
 
 
     def parseCorrectRoutes(self, routesParams):
@@ -113,10 +136,25 @@ class Network:
             self.handleChangesThread.start()
         signal.signal(signal.SIGINT, self.handleInterrupt)
         time.sleep(self.endTime/float(1000))
-        self.finalRoutes()
-        sys.stdout.write("\nRoutes taken by last batch of packets between each pair of clients:")
-        sys.stdout.write("\n"+self.getRouteString()+"\n")
-        self.joinAll()
+        if self.flows:
+            self.drainTraffic()
+        if self.analytic:
+            self.joinAll()
+            self.analyticRoutes()
+            sys.stdout.write("\nRoutes in the routers' forwarding state between each pair of clients:")
+            sys.stdout.write("\n"+self.getRouteString(logQueued=False)+"\n")
+        else:
+            self.finalRoutes()
+            sys.stdout.write("\nRoutes taken by last batch of packets between each pair of clients:")
+            sys.stdout.write("\n"+self.getRouteString()+"\n")
+        if self.flows:
+            sys.stdout.write("\nTraffic matrix statistics:\n"+self.getTrafficString()+"\n")
+        if any(link.isShaped() for _, _, _, link in self.links.values()):
+            sys.stdout.write("\nLink statistics:\n"+self.getLinkStatsString()+"\n")
+        if self.changes:
+            sys.stdout.write("\nLink change convergence:\n"+self.changes.getReportString()+"\n")
+        if not self.analytic:
+            self.joinAll()
 
 
     def addLinks(self):
@@ -135,27 +173,9 @@ class Network:
 
     def handleChanges(self):
         """Handle changes to links. Run this method in a separate thread.
-           Uses a priority queue to track time of next change.
+           Simultaneous changes are applied as one batch; see churn.py.
         """
-        startTime = time.time()*1000
-        while not self.changes.empty():
-            changeTime, target, change = self.changes.get()
-            currentTime = time.time()*1000
-            waitTime = (changeTime*self.latencyMultiplier + startTime) - currentTime
-            if waitTime > 0:
-                time.sleep(waitTime/float(1000))
-            # link changes
-            if change == "up":
-                addr1, addr2, p1, p2, c = target
-                link = Link(addr1, addr2, c, self.latencyMultiplier)
-                self.links[(addr1,addr2)] = (p1, p2, c, link)
-                self.routers[addr1].changeLink(("add", p1, addr2, link, c))
-                self.routers[addr2].changeLink(("add", p2, addr1, link, c))
-            elif change == "down":
-                addr1, addr2, = target
-                p1, p2, _, link = self.links[(addr1, addr2)]
-                self.routers[addr1].changeLink(("remove", p1))
-                self.routers[addr2].changeLink(("remove", p2))
+        self.changes.run(self.endTime)
 
 
     def updateRoute(self, src, dst, route, seqNum):
@@ -176,22 +196,27 @@ class Network:
             link.endtimereached = 1
             while not link.q12.empty():
                 packet = link.q12.get_nowait()
-                self.routes[(packet.srcAddr,packet.dstAddr)] = (packet.route, False, packet.content)
+                if not isLoadPacket(packet):
+                    self.routes[(packet.srcAddr,packet.dstAddr)] = (packet.route, False, packet.content)
             while not link.q21.empty():
                 packet = link.q21.get_nowait()
-                self.routes[(packet.srcAddr,packet.dstAddr)] = (packet.route, False, packet.content)
+                if not isLoadPacket(packet):
+                    self.routes[(packet.srcAddr,packet.dstAddr)] = (packet.route, False, packet.content)
 
 
-    def getRouteString(self, labelIncorrect=True):
+    def getRouteString(self, labelIncorrect=True, logQueued=True):
         """Create a string with all the current routes found by DATA packets and whether they are correct"""
         self.routesLock.acquire()
-        self.logQueuedPackets()
+        if logQueued:
+            self.logQueuedPackets()
         routeStrings = []
         allCorrect = True
         for src,dst in self.routes:
             route, isGood, _ = self.routes[(src,dst)]
-            routeStrings.append("Packet({} -> {}): {} {}".format(src, dst, route,
-                "" if (isGood or not labelIncorrect) else "Incorrect Route"))
+            label = "" if (isGood or not labelIncorrect) else "Incorrect Route"
+            if labelIncorrect and (src,dst) in self.routeFaults:
+                label += " (" + self.routeFaults[(src,dst)] + ")"
+            routeStrings.append("Packet({} -> {}): {} {}".format(src, dst, route, label))
             if not isGood:
                 allCorrect = False
         routeStrings.sort()
@@ -204,6 +229,50 @@ class Network:
         return routeString
 
 
+    def drainTraffic(self):
+        """Stop the traffic matrix and wait until the packets already sent have arrived,
+           so that packets still in flight at the end time are not counted as lost
+        """
+        for flow in self.flows:
+            flow.halted = True
+        time.sleep(sum(link.drainTime() for _, _, _, link in self.links.values()))
+
+
+    def getTrafficString(self):
+        """Create a string with per-pair delivered throughput, loss and end-to-end latency of the traffic matrix.
+           Called after drainTraffic(), so packets not received were dropped or misrouted.
+        """
+        lines = ["{:<10} {:>7} {:>7} {:>7} {:>12} {:>9} {:>9} {:>9}".format("Flow", "Sent", "Recvd", "Loss%",
+            "Thru(B/s)", "AvgLat", "MinLat", "MaxLat")]
+        for flow in sorted(self.flows, key=lambda f: (f.src, f.dst)):
+            st = self.clients[flow.dst].flowStats.get(flow.src) if flow.dst in self.clients else None
+            recvd = st.recvdPkts if st else 0
+            loss = 100.0 * (flow.seq - recvd) / flow.seq if flow.seq else 0.0
+            if st and st.lastTime > st.firstTime:
+                thru = "{:.1f}".format(st.recvdBytes * 1000.0 / (st.lastTime - st.firstTime))
+            else:
+                thru = "-"
+            if recvd:
+                lat = ["{:.0f}".format(st.latencySum / recvd), str(st.latencyMin), str(st.latencyMax)]
+            else:
+                lat = ["-", "-", "-"]
+            lines.append("{:<10} {:>7} {:>7} {:>7.1f} {:>12} {:>9} {:>9} {:>9}".format(flow.src + "->" + flow.dst,
+                flow.seq, recvd, loss, thru, *lat))
+        lines.append("(latencies in ms)")
+        return "\n".join(lines)
+
+
+    def getLinkStatsString(self):
+        """Create a string with per-direction utilization, buffer high-water mark and drop counters"""
+        lines = ["{:<10} {:>8} {:>8} {:>10} {:>6} {:>6}".format("Link", "Util%", "Pkts", "Bytes", "HiWat", "Drops")]
+        for addr1, addr2 in sorted(self.links):
+            _, _, _, link = self.links[(addr1, addr2)]
+            for direction, st in sorted(link.getStats().items()):
+                lines.append("{:<10} {:>8.1f} {:>8} {:>10} {:>6} {:>6}".format(direction, 100 * st["utilization"],
+                    st["sentPkts"], st["sentBytes"], st["highWater"], st["drops"]))
+        return "\n".join(lines)
+
+
     def getRoutePickle(self):
         """Create a pickle with the current routes found by DATA packets"""
         self.routesLock.acquire()
@@ -230,8 +299,45 @@ class Network:
         time.sleep(30)
 
 
+    def traceRoute(self, src, dst):
+        """Follow the forwarding state from client 'src' towards 'dst' hop by hop.
+           Returns (route, fault) where fault is None, "loop", "black hole" or "wrong destination".
+        """
+        route = [src]
+        link = self.clients[src].link
+        if link is None:
+            return route, "black hole"
+        node = link.get_e2(src)
+        visited = set()
+        while True:
+            route.append(node)
+            if node in self.clients:
+                return route, None if node == dst else "wrong destination"
+            if node in visited:
+                return route, "loop"
+            visited.add(node)
+            router = self.routers[node]
+            port = router.forwardingPort(dst)
+            link = router.links.get(port) if port is not None else None
+            if link is None:
+                return route, "black hole"
+            node = link.get_e2(node)
+
+
+    def analyticRoutes(self):
+        """Verify every (src, dst) pair in 'correctRoutes' against the converged forwarding state"""
+        self.routesLock.acquire()
+        for src, dst in self.correctRoutes:
+            route, fault = self.traceRoute(src, dst)
+            self.routes[(src,dst)] = (route, fault is None and route in self.correctRoutes[(src,dst)], 1000000)
+            if fault:
+                self.routeFaults[(src,dst)] = fault
+        self.routesLock.release()
+
+
     def joinAll(self):
         if self.changes:
+            self.changes.stop()
             self.handleChangesThread.join()
         for thread in self.threads:
             thread.join()
@@ -245,7 +351,7 @@ class Network:
 def main():
     """Main function parses command line arguments and runs network"""
     if len(sys.argv) < 2:
-        sys.stdout.write("Usage: python network.py [networkSimulationFile.json] [DV|LS]\n")
+        sys.stdout.write("Usage: python network.py [networkSimulationFile.json] [DV|DUAL|LS] [--analytic]\n")
         return
     netCfgFilepath = sys.argv[1]
     routerClass = Router
@@ -253,10 +359,13 @@ def main():
         if sys.argv[2] == "DV":
             from DVrouter import DVrouter
             routerClass = DVrouter
+        elif sys.argv[2] == "DUAL":
+            from DUALrouter import DUALrouter
+            routerClass = DUALrouter
         elif sys.argv[2] == "LS":
             from LSrouter import LSrouter
             routerClass = LSrouter
-    net = Network(netCfgFilepath, routerClass)
+    net = Network(netCfgFilepath, routerClass, "--analytic" in sys.argv[3:])
     net.run()
     return
 
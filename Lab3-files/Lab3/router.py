@@ -4,6 +4,7 @@ import sys
 import _thread
 import queue
 from link import Link
+from traffic import isLoadPacket
 
 class Router():
     """Router superclass that handles the details of packet send/receive and link changes.
@@ -19,7 +20,7 @@ class Router():
         self.lastTime = 0
         self.keepRunning = True
         self.f = open("logs/Router-"+self.addr+".dump", "w")
-        self.recvdPkts = []
+        self.recvdPkts = set()
 
 
     def changeLink(self, change):
@@ -56,19 +57,22 @@ class Router():
         while self.keepRunning:
             time.sleep(0.1)
             currTimeInMillisecs = int(round(time.time() * 1000))
-            try:
-                change = self.linkChanges.get_nowait()
+            # apply every pending link change, so simultaneous changes land in the same tick
+            while True:
+                try:
+                    change = self.linkChanges.get_nowait()
+                except queue.Empty:
+                    break
                 if change[0] == "add":
                     self.addLink(*change[1:])
                 elif change[0] == "remove":
                     self.removeLink(*change[1:])
-            except queue.Empty:
-                pass
-            for port in self.links.keys():
-                packet = self.links[port].recv(self.addr)
-                if packet:
+            for port, link in list(self.links.items()):
+                packet = link.recv(self.addr)
+                while packet:
                     self.logRecvdPacket(port, packet)
                     self.handlePacket(port, packet)
+                    packet = link.recv(self.addr)
             if (currTimeInMillisecs - self.lastTime >= self.heartbeatTime):
                 self.lastTime = currTimeInMillisecs
                 self.handlePeriodicOps()
@@ -83,7 +87,13 @@ class Router():
 
 
     def logRecvdPacket(self, port, packet):
-        """log recvd packets"""
+        """log recvd packets. Load packets are logged by length and not checked for duplicates,
+           so a traffic matrix does not grow the log and the duplicate set with its padding.
+        """
+        if isLoadPacket(packet):
+            self.f.write("Recvd LOAD packet (" + packet.srcAddr + "->" + packet.dstAddr + " len=" + str(len(packet.content)) + ") on port " + str(port) + "\n")
+            return
+
         s = packet.srcAddr+"-"+packet.dstAddr+"-"+packet.content
 
         if packet.isControl():
@@ -97,7 +107,7 @@ class Router():
             if s in self.recvdPkts:
                 self.f.write(" -- DUP PKT!!")
             else:
-                self.recvdPkts.append(s)
+                self.recvdPkts.add(s)
 
         self.f.write("\n")
 
@@ -116,6 +126,13 @@ class Router():
         self.send(port, packet)
 
 
+    def forwardingPort(self, dstAddr):
+        """Return the port a DATA packet addressed to 'dstAddr' would be forwarded on, or None if it would be dropped.
+           Used by the network to verify routes without sending packets; override it together with handlePacket.
+        """
+        return None
+
+
     def handleNewLink(self, port, endpoint, cost):
         """This method is called whenever a new link (including each of the initial links in the json file)
            is added to a router port, or an existing link cost is updated.
@@ -0,0 +1,112 @@
+import random
+from packet import Packet
+
+LOAD_PREFIX = "L,"
+
+class TrafficFlow:
+    """Load generator for one (src, dst) entry of the scenario traffic matrix.
+
+       Entry fields (only 'src' and 'dst' are required):
+         rate    : packets per second (default 10)
+         process : "cbr" (constant bit rate, default) or "poisson"
+         size    : content length in bytes, either a number or
+                   {"dist": "fixed"|"uniform"|"exponential", "value"|"min"/"max"|"mean": ...}
+         start, stop : scenario time units (same as link changes) during which the flow sends
+         seed    : seed for the flow's random inter-arrival and size draws
+    """
+
+    def __init__(self, params, latencyMultiplier):
+        self.src = params["src"]
+        self.dst = params["dst"]
+        self.rate = float(params.get("rate", 10))
+        self.process = params.get("process", "cbr")
+        if self.process not in ("cbr", "poisson"):
+            raise ValueError("Unknown traffic process: " + str(self.process))
+        size = params.get("size", 100)
+        self.size = size if isinstance(size, dict) else {"dist": "fixed", "value": size}
+        self.start = params.get("start", 0) * latencyMultiplier
+        self.stop = params.get("stop")
+        if self.stop is not None:
+            self.stop = self.stop * latencyMultiplier
+        self.rng = random.Random(params.get("seed"))
+        self.seq = 0
+        self.sentBytes = 0
+        self.nextTime = None
+        self.halted = False     # set when the network drains the traffic at the end of the run
+
+
+    def nextGap(self):
+        """Milliseconds until the next packet"""
+        if self.process == "poisson":
+            return self.rng.expovariate(self.rate) * 1000
+        return 1000 / self.rate
+
+
+    def nextSize(self):
+        dist = self.size.get("dist", "fixed")
+        if dist == "uniform":
+            n = self.rng.randint(int(self.size["min"]), int(self.size["max"]))
+        elif dist == "exponential":
+            n = int(self.rng.expovariate(1.0 / self.size["mean"]))
+        else:
+            n = int(self.size["value"])
+        return n
+
+
+    def makePacket(self, timeMillisecs):
+        """Build the next load packet. Content is 'L,<seq>,<send time ms>,' padded to the drawn size"""
+        self.seq += 1
+        header = LOAD_PREFIX + str(self.seq) + "," + str(timeMillisecs) + ","
+        content = header + "x" * max(0, self.nextSize() - len(header))
+        self.sentBytes += len(content)
+        return Packet(Packet.DATA, self.src, self.dst, content)
+
+
+    def due(self, timeMillisecs, startMillisecs):
+        """Return the packets whose send time has passed, catching up if the client loop fell behind"""
+        elapsed = timeMillisecs - startMillisecs
+        if self.halted or elapsed < self.start or (self.stop is not None and elapsed >= self.stop):
+            return []
+        if self.nextTime is None:
+            self.nextTime = timeMillisecs
+        packets = []
+        while self.nextTime <= timeMillisecs:
+            packets.append(self.makePacket(timeMillisecs))
+            self.nextTime += self.nextGap()
+        return packets
+
+
+class FlowStats:
+    """Receiver-side delivery statistics for packets from one source"""
+
+    def __init__(self):
+        self.recvdPkts = 0
+        self.recvdBytes = 0
+        self.dupPkts = 0
+        self.latencySum = 0.0
+        self.latencyMin = None
+        self.latencyMax = None
+        self.firstTime = None
+        self.lastTime = None
+        self.seen = set()
+
+
+    def record(self, content, timeMillisecs):
+        _, seq, sent, _ = content.split(",", 3)
+        if seq in self.seen:
+            self.dupPkts += 1
+            return
+        self.seen.add(seq)
+        latency = timeMillisecs - int(sent)
+        self.recvdPkts += 1
+        self.recvdBytes += len(content)
+        self.latencySum += latency
+        self.latencyMin = latency if self.latencyMin is None else min(self.latencyMin, latency)
+        self.latencyMax = latency if self.latencyMax is None else max(self.latencyMax, latency)
+        if self.firstTime is None:
+            self.firstTime = timeMillisecs
+        self.lastTime = timeMillisecs
+
+
+def isLoadPacket(packet):
+    return packet.isData() and packet.content is not None and packet.content.startswith(LOAD_PREFIX)
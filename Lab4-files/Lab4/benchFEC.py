@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from runBenchmarks import FILES, LOSSES, MAX_WORKERS, TIMEOUT, run_single_test
+from benchStats import median
+
+# -------------------------------------------------------------------
+#  Trade-off of XOR forward error correction per loss level: every
+#  (file, loss) case runs once per seed without and with --fec xor on
+#  the simulated clock. Per loss level the table gives the median time
+#  and bytes summed over the files, the parity payload bytes FEC sent,
+#  the segments it rebuilt, and the time it saved against the parity
+#  bytes it cost (negative savings mean FEC made the transfer slower).
+#  A single parity segment shifts the loss draws of the rest of the run,
+#  so at high loss a few seeds differ by tens of percent on noise alone.
+#
+#  Usage: python benchFEC.py [--files ...] [--losses ...] [--seeds N]
+#         [--fec-k K] [--jobs N]
+# -------------------------------------------------------------------
+BASE_ARGS = ["--virtual", "--log", "off"]
+FEC_LINE = re.compile(r"FEC: (\d+) parity segments \((\d+) payload bytes\), (\d+) segments rebuilt")
+
+
+def run(job):
+    """One run; returns (job, time, bytes, parity bytes, rebuilt), time None if it did not pass"""
+    f, loss, seed, args = job
+    res = run_single_test(f, loss, seed, BASE_ARGS + args, TIMEOUT, False)
+    if res["status"] != "OK":
+        return job, None, None, 0, 0
+    m = FEC_LINE.search(res["stdout"])
+    parityBytes, rebuilt = (int(m.group(2)), int(m.group(3))) if m else (0, 0)
+    return job, res["total_time"], res["total_bytes"], parityBytes, rebuilt
+
+
+def main():
+    parser = argparse.ArgumentParser(allow_abbrev=False, description="Parity bytes against time saved by --fec xor, per loss level.")
+    parser.add_argument("--files", nargs="+", default=["file3.txt", "file5.txt"], choices=FILES, metavar="FILE", help="send files to run (default: file3.txt file5.txt)")
+    parser.add_argument("--losses", nargs="+", type=int, default=LOSSES, choices=LOSSES, metavar="LOSS", help="loss rates to run (default: all)")
+    parser.add_argument("--seeds", type=int, default=8, help="runs per case and mode (default: 8)")
+    parser.add_argument("--fec-k", type=int, help="fixed FEC block size (default: adaptive)")
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS, help=f"runs in parallel (default: {MAX_WORKERS})")
+    args = parser.parse_args()
+
+    fec = ["--fec", "xor"] + (["--fec-k", str(args.fec_k)] if args.fec_k else [])
+    modes = {"plain": [], "fec": fec}
+    jobs = [(f, loss, seed, modes[m]) for f in args.files for loss in args.losses
+            for seed in range(1, args.seeds + 1) for m in modes]
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        results = list(executor.map(run, jobs))
+
+    runs = {}
+    for (f, loss, seed, a), t, b, parity, rebuilt in results:
+        runs.setdefault((loss, "fec" if a else "plain", f), []).append((t, b, parity, rebuilt))
+
+    print(f"{len(args.files)} file(s) x {args.seeds} seed(s), medians summed over the files")
+    print(f"{'Loss':<6} {'Time':>10} {'FEC time':>10} {'Saved':>8} {'Bytes':>10} {'FEC bytes':>10} {'Parity':>9} {'Rebuilt':>8} {'Parity B/s saved':>17}")
+    for loss in sorted(args.losses):
+        total = {}
+        for m in modes:
+            cases = [runs[(loss, m, f)] for f in args.files]
+            if any(t is None for c in cases for t, _, _, _ in c):
+                total[m] = None
+                continue
+            total[m] = [sum(median([r[i] for r in c]) for c in cases) for i in range(4)]
+        if total["plain"] is None or total["fec"] is None:
+            print(f"{str(loss) + '%':<6} a run failed or timed out")
+            continue
+        (t0, b0, _, _), (t1, b1, parity, rebuilt) = total["plain"], total["fec"]
+        saved = t0 - t1
+        cost = f"{parity / saved:>17.0f}" if saved > 0 else f"{'-':>17}"
+        print(f"{str(loss) + '%':<6} {t0:>10.1f} {t1:>10.1f} {100 * saved / t0:>7.1f}% {b0:>10.0f} {b1:>10.0f} {parity:>9.0f} {rebuilt:>8.0f} {cost}")
+
+
+if __name__ == "__main__":
+    main()
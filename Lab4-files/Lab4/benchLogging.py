@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import tempfile
+from link import Link
+from router import Router
+from packet import Packet
+from lossmodels import BernoulliLoss, makeRNG
+from pktlog import LEVELS
+
+# -------------------------------------------------------------------
+#  Micro-benchmark of the router's per-packet cost at each log level.
+#  MSS-sized data packets go through Router.handlePacket with 10% loss,
+#  alternating between the two ports like data and ACKs do, in a
+#  scratch directory with the console marks sent to /dev/null as when
+#  network.py runs under the benchmark harness. "flushed" is the full
+#  level with every console mark flushed, as the router used to do.
+#
+#  Usage: python benchLogging.py [packets]
+# -------------------------------------------------------------------
+MSS = 1000
+LOSS = 10
+
+
+def run(level, packets, flushMarks=False):
+    """Returns microseconds per packet in handlePacket at log level 'level'"""
+    router = Router("1", LOSS, BernoulliLoss(LOSS, makeRNG(1, "router-1")), level)
+    router.log.flushMarks = flushMarks
+    links = {1: Link("A", "1", 2, MSS), 2: Link("1", "B", 2, MSS)}
+    router.addLink(1, "A", links[1], 2)
+    router.addLink(2, "B", links[2], 2)
+    data = Packet("A", "B", 1, 0, 0, 0, 0, "x" * MSS)
+    ack = Packet("B", "A", 0, 1, 0, 1, 0, "1+1")
+    router.flowOf(data).connEstablished = 1
+    t = time.perf_counter()
+    for i in range(packets):
+        if i % 2 == 0:
+            router.handlePacket(1, data)
+        else:
+            router.handlePacket(2, ack)
+        if i % 1000 == 999:
+            links[1].clear()
+            links[2].clear()
+    router.closeLog()
+    return (time.perf_counter() - t) / packets * 1e6
+
+
+def main():
+    packets = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch, open(os.devnull, "w") as devnull:
+        os.chdir(scratch)
+        os.mkdir("logs")
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            results["flushed"] = run("full", packets, flushMarks=True)
+            for level in LEVELS:
+                results[level] = run(level, packets)
+        finally:
+            sys.stdout = stdout
+        os.chdir("/")
+    print("%-8s %14s %12s" % ("Level", "us / packet", "vs flushed"))
+    for level in ["flushed"] + LEVELS[::-1]:
+        print("%-8s %14.2f %11.2fx" % (level, results[level], results["flushed"] / results[level]))
+
+
+if __name__ == "__main__":
+    main()
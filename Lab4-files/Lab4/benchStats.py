@@ -0,0 +1,84 @@
+import math
+import itertools
+
+EXACT_MAX = 20000       # most rank splits enumerated for an exact p-value (8 vs 8 samples)
+
+# -------------------------------------------------------------------
+#  Order statistics and a rank test for small benchmark samples: a few
+#  seeds per case, with heavy-tailed times, so nothing assumes normality.
+# -------------------------------------------------------------------
+
+
+def median(values: list) -> float:
+    s = sorted(values)
+    n = len(s)
+    return s[n // 2] if n % 2 else (s[n // 2 - 1] + s[n // 2]) / 2
+
+
+def percentile(values: list, q: float) -> float:
+    """q-th percentile (0-100), linear interpolation between order statistics"""
+    s = sorted(values)
+    pos = (len(s) - 1) * q / 100
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (pos - lo)
+
+
+def median_ci(values: list, conf: float = 0.95) -> tuple:
+    """
+    Distribution-free confidence interval of the median: the order statistics
+    x(k) and x(n-k+1) with the largest k such that P(Binomial(n, 1/2) < k) <= (1-conf)/2.
+    With fewer than 6 samples no such k exists at 95% and the interval is the sample range.
+    """
+    s = sorted(values)
+    n = len(s)
+    alpha = (1 - conf) / 2
+    k, tail = 0, 0.0
+    while k < n // 2:
+        tail += math.comb(n, k) / 2 ** n      # P(B = k), tail is now P(B <= k)
+        if tail > alpha:
+            break
+        k += 1
+    k = max(k, 1)
+    return s[k - 1], s[n - k]
+
+
+def mann_whitney(current: list, previous: list) -> float:
+    """
+    One-sided Mann-Whitney U test. Returns the p-value of 'current' tending to be larger
+    than 'previous'. Small samples get the exact permutation distribution of the rank sum
+    (ties keep their average ranks); larger ones the normal approximation with tie and
+    continuity corrections, which is too optimistic at a few samples per side.
+    """
+    n1, n2 = len(current), len(previous)
+    if not n1 or not n2:
+        return 1.0
+    pooled = sorted([(v, 0) for v in current] + [(v, 1) for v in previous])
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for t in range(i, j + 1):
+            ranks[t] = (i + j) / 2 + 1
+        ties += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    r1 = sum(r for r, (_, group) in zip(ranks, pooled) if group == 0)
+    n = n1 + n2
+    if math.comb(n, n1) <= EXACT_MAX:
+        # every choice of n1 of the pooled ranks is equally likely under the null hypothesis
+        hits = sum(1 for pick in itertools.combinations(ranks, n1) if sum(pick) >= r1 - 1e-9)
+        return hits / math.comb(n, n1)
+    u = r1 - n1 * (n1 + 1) / 2
+    var = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if var <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(var)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def min_p_value(n1: int, n2: int) -> float:
+    """Smallest p-value mann_whitney can return for samples of sizes n1 and n2 (complete separation)"""
+    return mann_whitney(list(range(n2, n2 + n1)), list(range(n2)))
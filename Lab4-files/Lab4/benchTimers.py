@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+import sys
+import time
+import random
+import tracemalloc
+from timers import Segment, TimerHeap
+
+# -------------------------------------------------------------------
+#  Micro-benchmark of the sender's retransmission bookkeeping with
+#  large windows: the old per-tick scan over a dict of dicts versus
+#  Segment records with a TimerHeap. Each simulated tick acks the
+#  segments sent one RTT ago (a fraction is lost), retransmits the
+#  expired ones and refills the window.
+#
+#  Usage: python benchTimers.py [window ...]
+# -------------------------------------------------------------------
+TICK = 0.1
+RTT_TICKS = 40          # round trip of the 01.json topology, in ticks
+RTO = 4.1
+LOSS = 0.1
+TICKS = 2000
+
+
+class ScanSender:
+    """Bookkeeping as MyClient did it before: scan every unacked segment each tick"""
+
+    def __init__(self):
+        self.unacked = {}
+
+    def send(self, seq, now):
+        self.unacked[seq] = {"packet": None, "time": now, "sends": 1, "acked": False}
+
+    def ack(self, seq):
+        info = self.unacked.get(seq)
+        if info is not None:
+            info["acked"] = True
+
+    def retransmit(self, now):
+        resent = []
+        for seq, info in list(self.unacked.items()):
+            if not info["acked"] and (now - info["time"] > RTO):
+                info["time"] = now
+                info["sends"] += 1
+                resent.append(seq)
+        return resent
+
+    def advance(self, base):
+        while base in self.unacked and self.unacked[base]["acked"]:
+            del self.unacked[base]
+            base += 1
+        return base
+
+
+class HeapSender:
+    """Bookkeeping with Segment records and a TimerHeap"""
+
+    def __init__(self):
+        self.unacked = {}
+        self.timers = TimerHeap()
+
+    def send(self, seq, now):
+        seg = Segment(seq, now)
+        self.unacked[seq] = seg
+        self.timers.start(seg)
+
+    def ack(self, seq):
+        seg = self.unacked.get(seq)
+        if seg is not None:
+            seg.acked = True
+
+    def retransmit(self, now):
+        resent = []
+        for seg in self.timers.expired(now, RTO):
+            seg.time = now
+            seg.sends += 1
+            self.timers.start(seg)
+            resent.append(seg.seq)
+        return resent
+
+    def advance(self, base):
+        while base in self.unacked and self.unacked[base].acked:
+            del self.unacked[base]
+            base += 1
+        return base
+
+
+def run(senderClass, window, seed=1):
+    """Drive a new sender for TICKS ticks.
+       Returns (seconds spent in retransmit(), retransmissions, peak traced KiB)
+    """
+    sender = senderClass()
+    rng = random.Random(seed)
+    acks = {}               # tick at which acks arrive -> seqs
+    base, nextSeq, retx = 1, 1, 0
+    spent = 0.0
+    tracemalloc.start()
+    for tick in range(1, TICKS + 1):
+        now = tick * TICK
+        for seq in acks.pop(tick, []):
+            sender.ack(seq)
+        base = sender.advance(base)
+        t = time.perf_counter()
+        sent = sender.retransmit(now)
+        spent += time.perf_counter() - t
+        retx += len(sent)
+        while nextSeq < base + window:
+            sender.send(nextSeq, now)
+            sent.append(nextSeq)
+            nextSeq += 1
+        # every segment sent this tick is acked one round trip later unless it is lost
+        acks[tick + RTT_TICKS] = [seq for seq in sent if rng.random() >= LOSS]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return spent, retx, peak // 1024
+
+
+def main():
+    windows = [int(w) for w in sys.argv[1:]] or [1000, 5000, 20000]
+    print("%-8s %-6s %14s %12s %12s" % ("Window", "Impl", "retx time (s)", "retransmits", "peak KiB"))
+    for window in windows:
+        for name, senderClass in (("scan", ScanSender), ("heap", HeapSender)):
+            spent, retx, peak = run(senderClass, window)
+            print("%-8d %-6s %14.3f %12d %12d" % (window, name, spent, retx, peak))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,15 @@
 import time
 import sys
 import queue
+import simclock
 from packet import Packet
+from pktlog import PacketLog
 
 class Client:
     """Client class"""
 
-    def __init__(self, addr, sendFile, recvFile, MSS):
-        """Inititalize parameters"""
+    def __init__(self, addr, sendFile, recvFile, MSS, logLevel="full"):
+        """Inititalize parameters. 'logLevel' sets what goes to the packet dump (see pktlog.py)"""
         self.addr = addr
         self.sendFile = sendFile
         self.recvFile = recvFile
@@ -16,7 +18,13 @@ class Client:
         self.link = None
         self.linkChanges = queue.Queue()
         self.keepRunning = True
-        self.f = open("logs/Client-"+self.addr+"-recvd-pkts.dump", "w")
+        self.log = PacketLog("logs/Client-"+self.addr+"-recvd-pkts.dump", logLevel)
+        self.recvdPktCnt = 0
+
+
+    def closeLog(self):
+        """Write the summary line and close the packet dump"""
+        self.log.close("Summary - received: " + str(self.recvdPktCnt) + " pkts")
 
 
     def changeLink(self, change):
@@ -29,15 +37,20 @@ class Client:
     def runClient(self):
         """Main loop of client"""
         while self.keepRunning:
-            time.sleep(0.1)
-            try:
-                change = self.linkChanges.get_nowait()
-                if change[0] == "add":
-                    self.link = change[1]
-            except queue.Empty:
-                pass
-            self.handleRecvdPackets()
-            self.sendPackets()
+            time.sleep(simclock.TICK)
+            self.tick()
+
+
+    def tick(self):
+        """One iteration of the main loop: apply a link change, then receive and send packets"""
+        try:
+            change = self.linkChanges.get_nowait()
+            if change[0] == "add":
+                self.link = change[1]
+        except queue.Empty:
+            pass
+        self.handleRecvdPackets()
+        self.sendPackets()
 
 
     def handleRecvdPackets(self):
@@ -0,0 +1,120 @@
+import zlib
+import lzma
+import base64
+from filesource import FileSource
+
+METHODS = ["zlib", "lzma"]
+
+CHUNK = 1 << 16     # bytes of the send file fed to the compressor at a time
+
+
+def makeCompressor(method):
+    if method == "zlib":
+        return zlib.compressobj(9)
+    elif method == "lzma":
+        return lzma.LZMACompressor(preset=9)
+    raise ValueError("Unknown compression method: " + str(method))
+
+
+def makeDecompressor(method):
+    if method == "zlib":
+        return zlib.decompressobj()
+    elif method == "lzma":
+        return lzma.LZMADecompressor()
+    raise ValueError("Unknown compression method: " + str(method))
+
+
+class CompressedSource:
+    """Drop-in for FileSource that sends the compressed file instead.
+
+       The send file is compressed as a stream, CHUNK bytes at a time, only as far as the
+       segments asked for so far require. The compressed bytes are base85 encoded so every
+       payload is a printable string, and the text is cut into MSS-sized segments. Encoded
+       text is kept for retransmissions until the segments are acknowledged (see release), so
+       memory is bounded by the window plus one compressed CHUNK rather than the whole file.
+       The digest covers the original bytes, as they are fed to the compressor.
+    """
+
+    def __init__(self, f, MSS, method, blockSize=0):
+        self.MSS = MSS
+        self.file = FileSource(f, MSS, blockSize)
+        self.digest = self.file.digest
+        self.compressor = makeCompressor(method)
+        self.offset = 0             # next byte of the send file to compress
+        self.pending = b""          # compressed bytes not encoded yet (less than one base85 group)
+        self.encoded = bytearray()  # base85 text of the compressed stream from segment 'first' on
+        self.first = 1              # first segment still held in 'encoded'
+        self.released = 1           # segments below this one are acknowledged
+        self.done = False
+
+
+    def encode(self, data, final=False):
+        data = self.pending + data
+        n = len(data) if final else len(data) - len(data) % 4
+        self.encoded += base64.b85encode(data[:n])
+        self.pending = data[n:]
+
+
+    def has(self, seq):
+        """True if segment 'seq' exists, compressing more of the file if needed"""
+        while not self.done and len(self.encoded) < (seq - self.first + 1) * self.MSS:
+            chunk = self.file.view[self.offset:self.offset + CHUNK]
+            self.offset += len(chunk)
+            if len(chunk):
+                self.digest.update(chunk)
+                self.encode(self.compressor.compress(chunk))
+            else:
+                self.encode(self.compressor.flush(), final=True)
+                self.done = True
+            chunk.release()
+        return len(self.encoded) > (seq - self.first) * self.MSS
+
+
+    def payload(self, seq):
+        start = (seq - self.first) * self.MSS
+        return self.encoded[start:start + self.MSS].decode("ascii")
+
+
+    def release(self, seq):
+        """Segments below 'seq' are acknowledged and will not be sent again: drop their text.
+           The text is cut once a CHUNK of it can go, so trimming stays cheap per segment.
+        """
+        self.released = max(self.released, seq)
+        n = (self.released - self.first) * self.MSS
+        if n >= CHUNK:
+            del self.encoded[:n]
+            self.first = self.released
+
+
+    def close(self):
+        self.file.close()
+
+
+class DecompressingWriter:
+    """Undoes CompressedSource at the receiver: decodes and decompresses in-order payloads
+       as they are delivered and writes the original bytes to 'f' (a latin-1 text file).
+    """
+
+    def __init__(self, f, method):
+        self.f = f
+        self.decompressor = makeDecompressor(method)
+        self.text = ""              # base85 text not decoded yet (less than one group)
+        self.recvdChars = 0
+
+
+    def write(self, payload):
+        self.recvdChars += len(payload)
+        text = self.text + payload
+        n = len(text) - len(text) % 5
+        self.text = text[n:]
+        if n:
+            self.f.write(self.decompressor.decompress(base64.b85decode(text[:n])).decode("latin-1"))
+
+
+    def finish(self):
+        """The stream is complete: decode the last partial group and flush the decompressor"""
+        data = self.decompressor.decompress(base64.b85decode(self.text)) if self.text else b""
+        if hasattr(self.decompressor, "flush"):
+            data += self.decompressor.flush()
+        self.text = ""
+        self.f.write(data.decode("latin-1"))
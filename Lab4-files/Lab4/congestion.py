@@ -0,0 +1,119 @@
+MAX_WINDOW = 1000     # default largest window of the controllers, and of MyClient's ring buffers (its "maxWindow")
+
+
+class FixedWindow:
+    """Sending window controller that keeps the window at 'initial' segments.
+
+       Controllers get selective ACK feedback from MyClient through onAck() for every
+       newly acknowledged segment and onLoss() for every retransmission timeout, and
+       MyClient sends new data while next_seq_num < base + getWindow().
+    """
+
+    name = "fixed"
+
+    def __init__(self, initial=20, minWindow=1, maxWindow=MAX_WINDOW):
+        self.minWindow = minWindow
+        self.maxWindow = maxWindow
+        self.cwnd = float(initial)
+
+
+    def getWindow(self):
+        """Current window in segments"""
+        return max(self.minWindow, min(self.maxWindow, int(self.cwnd)))
+
+
+    def onAck(self, seq, sends):
+        """Segment 'seq' was acknowledged after being sent 'sends' times"""
+        pass
+
+
+    def onLoss(self, seq, nextSeq):
+        """The retransmission timer of segment 'seq' expired; 'nextSeq' is the next new sequence number"""
+        pass
+
+
+    def getStateString(self):
+        return self.name + " cwnd: " + str(round(self.cwnd, 2))
+
+
+class AIMDWindow(FixedWindow):
+    """Additive increase, multiplicative decrease (TCP Reno style without fast recovery).
+
+       Slow start doubles the window every round trip until 'ssthresh', then it grows by
+       one segment per window of ACKs. A timeout multiplies it by 'beta', at most once per
+       window of data, since all segments in flight when the loss was detected may be lost too.
+    """
+
+    name = "aimd"
+
+    def __init__(self, initial=20, minWindow=1, maxWindow=MAX_WINDOW, beta=0.5, ssthresh=None):
+        FixedWindow.__init__(self, initial, minWindow, maxWindow)
+        self.beta = beta
+        self.ssthresh = float(ssthresh if ssthresh is not None else maxWindow)
+        self.recover = 0        # losses of segments below this were already reacted to
+
+
+    def onAck(self, seq, sends):
+        if self.cwnd < self.ssthresh:
+            self.cwnd += 1
+        else:
+            self.cwnd += 1.0 / self.cwnd
+        self.cwnd = min(self.cwnd, self.maxWindow)
+
+
+    def onLoss(self, seq, nextSeq):
+        if seq < self.recover:
+            return
+        self.ssthresh = max(self.minWindow, self.cwnd * self.beta)
+        self.cwnd = self.ssthresh
+        self.recover = nextSeq
+
+
+class LossRateWindow(FixedWindow):
+    """Window sized from the measured segment loss rate.
+
+       Losses in the simulator are random rather than caused by queueing, so shrinking the
+       window does not save bytes: every segment costs 1/(1-p) transmissions whatever the
+       window. What the window does decide is time, since segments waiting for a
+       retransmission occupy window slots. This controller keeps 'initial' slots for new
+       data by growing the window to initial/(1-p), where p is a moving average of the
+       per-transmission loss rate (timeouts vs. first-time ACKs). 'maxLoss' caps p, which
+       bounds how far the window grows at very high loss.
+    """
+
+    name = "lossrate"
+
+    def __init__(self, initial=20, minWindow=1, maxWindow=MAX_WINDOW, weight=0.05, maxLoss=0.9):
+        FixedWindow.__init__(self, initial, minWindow, maxWindow)
+        self.target = float(initial)
+        self.weight = weight
+        self.maxLoss = maxLoss
+        self.lossRate = 0.0
+
+
+    def update(self, lost):
+        self.lossRate = (1 - self.weight) * self.lossRate + self.weight * (1.0 if lost else 0.0)
+        self.cwnd = self.target / (1 - min(self.lossRate, self.maxLoss))
+
+
+    def onAck(self, seq, sends):
+        if sends == 1:
+            self.update(False)
+
+
+    def onLoss(self, seq, nextSeq):
+        self.update(True)
+
+
+    def getStateString(self):
+        return FixedWindow.getStateString(self) + " loss: " + str(round(self.lossRate, 3))
+
+
+CONTROLLERS = {cls.name: cls for cls in (FixedWindow, AIMDWindow, LossRateWindow)}
+
+
+def makeController(name, **params):
+    """Create the window controller registered as 'name'"""
+    if name not in CONTROLLERS:
+        raise ValueError("Unknown window controller: " + str(name) + " (choose from " + ", ".join(sorted(CONTROLLERS)) + ")")
+    return CONTROLLERS[name](**params)
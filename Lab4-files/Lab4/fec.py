@@ -0,0 +1,173 @@
+from packet import Packet
+
+KMAX = 16       # largest block, also how far back the decoder keeps delivered payloads
+KMIN = 2        # smallest adaptive block: parity stays at most half the data
+
+
+def toInt(payload):
+    return int.from_bytes(payload.encode("latin-1"), "little")
+
+
+class XOREncoder:
+    """Sender side of XOR forward error correction.
+
+       New data segments are grouped in blocks of k consecutive sequence numbers. After the
+       last segment of a block is sent for the first time, one parity segment carrying the
+       XOR of the block's payloads follows, so the receiver can rebuild any single lost
+       segment of the block without a retransmission. Parity segments are marked by a
+       negative seqNum (minus the block's first seq); their ackNum holds k << 16 plus the
+       XOR of the payload lengths, which gives the length of a rebuilt short last segment.
+
+       With 'k' unset the block size adapts to the loss rate: k = 1/q - 1 for a forward
+       loss estimate q, so a block of k+1 segments expects about one loss. q is derived from
+       a moving average of the per-transmission loss rate seen by the sender (timeouts vs.
+       first-time ACKs), which includes lost ACKs: q = 1 - sqrt(1 - p). The adaptive k stops
+       at KMIN: one-segment blocks would send every segment twice, about the file again in
+       parity, for the few blocks XOR can still rebuild at that loss (see benchFEC.py). With
+       a fixed k of 1 retransmissions are protected as well, each by its own one-segment block.
+    """
+
+    def __init__(self, k=None, weight=0.05, src="A", dst="B"):
+        self.fixedK = k
+        self.src = src          # addresses of the parity packets
+        self.dst = dst
+        self.weight = weight
+        self.lossRate = 0.0
+        self.first = None       # first seq of the open block
+        self.k = 0              # size of the open block
+        self.count = 0          # segments of the open block sent so far
+        self.parity = 0
+        self.lenXor = 0
+        self.maxLen = 0
+        self.paritySent = 0
+        self.parityBytes = 0
+
+
+    def blockSize(self):
+        if self.fixedK:
+            return self.fixedK
+        q = 1 - (1 - min(self.lossRate, 0.99)) ** 0.5
+        if q <= 0:
+            return KMAX
+        return max(KMIN, min(KMAX, int(1 / q) - 1))
+
+
+    def add(self, seq, payload):
+        """Account for the first send of data segment 'seq'. Returns the parity Packet once its block is complete"""
+        if self.first is None:
+            self.first, self.k = seq, self.blockSize()
+            self.count, self.parity, self.lenXor, self.maxLen = 0, 0, 0, 0
+        self.count += 1
+        self.parity ^= toInt(payload)
+        self.lenXor ^= len(payload)
+        self.maxLen = max(self.maxLen, len(payload))
+        if self.count == self.k:
+            return self.flush()
+        return None
+
+
+    def flush(self):
+        """Close the open block early (at the end of the file). Returns its parity Packet, or None"""
+        if self.first is None:
+            return None
+        payload = self.parity.to_bytes(self.maxLen, "little").decode("latin-1")
+        pkt = Packet(self.src, self.dst, -self.first, (self.count << 16) | self.lenXor, 0, 0, 0, payload)
+        self.first = None
+        self.paritySent += 1
+        self.parityBytes += len(payload)
+        return pkt
+
+
+    def repair(self, seq, payload):
+        """A retransmission of 'seq' is being sent. With one-segment blocks (a fixed k of 1)
+           returns a parity Packet for it (a copy), else None.
+        """
+        if self.blockSize() > 1:
+            return None
+        self.paritySent += 1
+        self.parityBytes += len(payload)
+        return Packet(self.src, self.dst, -seq, (1 << 16) | len(payload), 0, 0, 0, payload)
+
+
+    def onAck(self, sends):
+        if sends == 1:
+            self.lossRate = (1 - self.weight) * self.lossRate
+
+
+    def onLoss(self):
+        self.lossRate = (1 - self.weight) * self.lossRate + self.weight
+
+
+class XORDecoder:
+    """Receiver side: rebuilds the one missing segment of a block from its parity.
+
+       Payloads are kept from KMAX segments below the in-order point on, so the members of
+       every block that can still have a hole are at hand even after they were delivered.
+    """
+
+    def __init__(self):
+        self.recent = {}        # seq -> payload
+        self.parities = {}      # block first seq -> (k, lenXor, parity int, parity length)
+        self.blockOf = {}       # seq -> first seq of the block whose parity we hold
+        self.expected = 1       # in-order point at the last prune
+        self.recovered = 0
+
+
+    def prune(self, expected):
+        """Forget payloads and parities that can no longer help, once the in-order point moved"""
+        if expected == self.expected:
+            return
+        for seq in range(self.expected - KMAX, expected - KMAX):
+            self.recent.pop(seq, None)
+        self.expected = expected
+        for first in [f for f, (k, _, _, _) in self.parities.items() if f + k <= expected]:
+            self.dropParity(first)
+
+
+    def dropParity(self, first):
+        k = self.parities.pop(first)[0]
+        for seq in range(first, first + k):
+            self.blockOf.pop(seq, None)
+
+
+    def addData(self, seq, payload, expected):
+        """A data segment was received. Returns the list of (seq, payload) it lets us rebuild"""
+        if seq >= expected - KMAX:
+            self.recent[seq] = payload
+        first = self.blockOf.get(seq)
+        recovered = self.tryRecover(first, expected) if first is not None else []
+        self.prune(expected)
+        return recovered
+
+
+    def addParity(self, packet, expected):
+        """A parity segment was received. Returns the list of (seq, payload) it lets us rebuild"""
+        first = -packet.seqNum
+        k, lenXor = packet.ackNum >> 16, packet.ackNum & 0xffff
+        if first + k <= expected or first in self.parities:
+            return []
+        self.parities[first] = (k, lenXor, toInt(packet.payload), len(packet.payload))
+        for seq in range(first, first + k):
+            self.blockOf[seq] = first
+        return self.tryRecover(first, expected)
+
+
+    def tryRecover(self, first, expected):
+        k, lenXor, parity, parityLen = self.parities[first]
+        missing = [s for s in range(first, first + k) if s >= expected and s not in self.recent]
+        if len(missing) > 1:
+            return []
+        if not missing:
+            self.dropParity(first)
+            return []
+        seq = missing[0]
+        for s in range(first, first + k):
+            if s != seq:
+                payload = self.recent.get(s)
+                if payload is None:
+                    return []   # delivered too long ago to be kept, cannot happen with k <= KMAX
+                parity ^= toInt(payload)
+                lenXor ^= len(payload)
+        self.dropParity(first)
+        self.recovered += 1
+        return [(seq, parity.to_bytes(parityLen, "little")[:lenXor].decode("latin-1"))]
@@ -0,0 +1,73 @@
+import os
+from intervals import IntervalSet
+
+class OffsetSink:
+    """Receive file written by offset: segment 'seq' goes to byte (seq-1)*MSS, in any order.
+
+       Every segment but the last is exactly MSS bytes, so a segment's position is known
+       as soon as it arrives and nothing waits for the holes in front of it. Received
+       sequence numbers are tracked in an IntervalSet. Payloads are staged until
+       'flushBytes' have accumulated, then written with one os.pwrite per contiguous run,
+       so memory stays bounded by 'flushBytes' whatever the amount of reordering.
+
+       With a 'digest' (see integrity.py) the in-order prefix is fed to it as it grows;
+       segments flushed while still behind a hole are read back from the page cache.
+    """
+
+    def __init__(self, f, MSS, flushBytes=1 << 16, digest=None):
+        """'f' is the open receive file, written through its file descriptor (opened for reading too with a digest)"""
+        self.fd = f.fileno()
+        self.MSS = MSS
+        self.flushBytes = flushBytes
+        self.received = IntervalSet()
+        self.pending = {}           # seq -> payload bytes, not written yet
+        self.pendingBytes = 0
+        self.writes = 0
+        self.digest = digest
+        self.digested = 1           # next segment to feed to the digest
+
+
+    def put(self, seq, payload):
+        """Store the payload of segment 'seq'. Returns False if it was already received"""
+        if not self.received.add(seq, seq + 1):
+            return False
+        data = payload.encode("latin-1")
+        self.pending[seq] = data
+        self.pendingBytes += len(data)
+        if self.digest is not None and seq == self.digested:
+            self.digestPrefix()
+        if self.pendingBytes >= self.flushBytes:
+            self.flush()
+        return True
+
+
+    def contiguous(self, start=1):
+        """First sequence number missing after 'start'"""
+        return self.received.prefixEnd(start)
+
+
+    def digestPrefix(self):
+        """Feed the segments that are now in order to the digest"""
+        end = self.received.prefixEnd(self.digested)
+        while self.digested < end:
+            data = self.pending.get(self.digested)
+            if data is None:
+                data = os.pread(self.fd, self.MSS, (self.digested - 1) * self.MSS)
+            self.digest.update(data)
+            self.digested += 1
+
+
+    def flush(self):
+        """Write all staged payloads, one pwrite per run of consecutive sequence numbers"""
+        seqs = sorted(self.pending)
+        i = 0
+        while i < len(seqs):
+            j = i + 1
+            while j < len(seqs) and seqs[j] == seqs[j - 1] + 1:
+                j += 1
+            data = b"".join(self.pending[s] for s in seqs[i:j])
+            os.pwrite(self.fd, data, (seqs[i] - 1) * self.MSS)
+            self.writes += 1
+            i = j
+        self.pending = {}
+        self.pendingBytes = 0
@@ -0,0 +1,51 @@
+import os
+import mmap
+from integrity import StreamDigest
+
+class FileSource:
+    """The send file as a sequence of MSS-sized segments, read from a memory map.
+
+       Segment 'seq' (numbered from 1) is bytes [(seq-1)*MSS, seq*MSS) of the file, so a
+       payload can be rebuilt from its sequence number for the first send and any
+       retransmission alike; nothing is buffered per segment. Payloads are decoded as
+       latin-1, one character per byte, so the receiver must write them back as latin-1.
+       Segments read for the first time in order are fed to 'digest' (see integrity.py).
+    """
+
+    def __init__(self, f, MSS, blockSize=0):
+        """'f' is the open send file, only its file descriptor is used.
+           'blockSize' is the CRC block size of the digest, 0 for none.
+        """
+        self.MSS = MSS
+        self.size = os.fstat(f.fileno()).st_size
+        self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.view = memoryview(self.map) if self.map is not None else memoryview(b"")
+        self.segments = (self.size + MSS - 1) // MSS    # number of data segments
+        self.digest = StreamDigest(blockSize)
+        self.digested = 1       # next segment to feed to the digest
+
+
+    def has(self, seq):
+        """True if segment 'seq' exists"""
+        return seq <= self.segments
+
+
+    def payload(self, seq):
+        """Payload string of segment 'seq', decoded straight from the mapped pages"""
+        start = (seq - 1) * self.MSS
+        data = self.view[start:start + self.MSS]
+        if seq == self.digested:
+            self.digest.update(data)
+            self.digested += 1
+        return str(data, "latin-1")
+
+
+    def release(self, seq):
+        """Segments below 'seq' are acknowledged. Nothing to drop: payloads come from the map"""
+        pass
+
+
+    def close(self):
+        self.view.release()
+        if self.map is not None:
+            self.map.close()
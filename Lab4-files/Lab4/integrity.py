@@ -0,0 +1,68 @@
+import zlib
+import hashlib
+
+class StreamDigest:
+    """SHA-256 of a byte stream fed in order, with optional CRC-32s per 'blockSize' bytes.
+
+       The sender digests the file as it reads it and the receiver as it delivers in-order
+       data, so the transfer can be checked without reading either file again. The block
+       checksums locate the first corrupted block when the digests differ.
+    """
+
+    def __init__(self, blockSize=0):
+        self.sha = hashlib.sha256()
+        self.size = 0
+        self.blockSize = blockSize
+        self.crcs = []          # CRC-32 of every complete block
+        self.crc = 0            # CRC-32 of the current partial block
+        self.inBlock = 0        # bytes in the current partial block
+
+
+    def update(self, data):
+        self.sha.update(data)
+        self.size += len(data)
+        view = memoryview(data)
+        while self.blockSize and len(view):
+            n = min(len(view), self.blockSize - self.inBlock)
+            self.crc = zlib.crc32(view[:n], self.crc)
+            self.inBlock += n
+            view = view[n:]
+            if self.inBlock == self.blockSize:
+                self.crcs.append(self.crc)
+                self.crc, self.inBlock = 0, 0
+
+
+    def blocks(self):
+        """CRC-32s of all blocks, the last one possibly partial"""
+        return self.crcs + ([self.crc] if self.inBlock else [])
+
+
+    def hexdigest(self):
+        return self.sha.hexdigest()
+
+
+def compareDigests(sent, recvd):
+    """Returns (True if the streams match, a one-line explanation)"""
+    if sent.hexdigest() == recvd.hexdigest():
+        return True, "sha256 " + sent.hexdigest() + ", " + str(sent.size) + " bytes"
+    detail = "sent " + str(sent.size) + " bytes, received " + str(recvd.size)
+    if sent.blockSize and sent.blockSize == recvd.blockSize:
+        sentBlocks, recvdBlocks = sent.blocks(), recvd.blocks()
+        for i in range(max(len(sentBlocks), len(recvdBlocks))):
+            if i >= len(sentBlocks) or i >= len(recvdBlocks) or sentBlocks[i] != recvdBlocks[i]:
+                detail += ", first bad block at byte offset " + str(i * sent.blockSize)
+                break
+    return False, detail
+
+
+class DigestWriter:
+    """Text file wrapper that digests the latin-1 bytes of everything written through it"""
+
+    def __init__(self, f, digest):
+        self.f = f
+        self.digest = digest
+
+
+    def write(self, text):
+        self.digest.update(text.encode("latin-1"))
+        self.f.write(text)
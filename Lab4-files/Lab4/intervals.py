@@ -0,0 +1,63 @@
+from bisect import bisect_right
+
+class IntervalSet:
+    """Set of integers stored as sorted, disjoint, non-adjacent half-open intervals [start, end).
+
+       Memory grows with the number of holes between received ranges, not with the
+       number of members.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+
+    def add(self, start, end):
+        """Add [start, end), merging with overlapping or adjacent intervals.
+           Returns the number of integers that were not in the set before.
+        """
+        if start >= end:
+            return 0
+        starts, ends = self.starts, self.ends
+        # intervals i..j-1 touch [start, end)
+        i = bisect_right(ends, start - 1)
+        j = bisect_right(starts, end)
+        if i == j:
+            starts.insert(i, start)
+            ends.insert(i, end)
+            return end - start
+        covered = sum(min(ends[k], end) - max(starts[k], start) for k in range(i, j) if ends[k] > start and starts[k] < end)
+        newStart, newEnd = min(start, starts[i]), max(end, ends[j - 1])
+        starts[i:j] = [newStart]
+        ends[i:j] = [newEnd]
+        return (end - start) - covered
+
+
+    def __contains__(self, x):
+        i = bisect_right(self.starts, x) - 1
+        return i >= 0 and x < self.ends[i]
+
+
+    def find(self, x):
+        """The interval (start, end) that contains 'x', or None"""
+        i = bisect_right(self.starts, x) - 1
+        if i >= 0 and x < self.ends[i]:
+            return self.starts[i], self.ends[i]
+        return None
+
+
+    def prefixEnd(self, start):
+        """End of the run of members beginning at 'start' ('start' itself if it is missing)"""
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and start < self.ends[i]:
+            return self.ends[i]
+        return start
+
+
+    def __len__(self):
+        """Number of intervals"""
+        return len(self.starts)
+
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
@@ -1,25 +1,61 @@
 #
 import _thread
 import sys
-import queue
-import time
+import heapq
+import random
 import threading
+import itertools
+import simclock
 
 class Link:
     """Link class implements the link between two routers/clients.
-       Handles sending and receiving packets using threadsafe queues.
+       Handles sending and receiving packets using threadsafe delay heaps:
+       every packet is scheduled for its own arrival time, so packets sent
+       together arrive together and one receive call hands back all that are due.
+
+       Optional 'params' (the 6th element of a link entry in the json file) perturb the delay:
+         jitter       : extra delay in seconds drawn uniformly from [0, jitter] per packet (default 0)
+         reorder      : probability that a packet is held back by 'reorderDelay' (default 0)
+         reorderDelay : extra delay in seconds of a held back packet (default: the link latency)
+         seed         : seed for the jitter and reorder draws
     """
 
-    def __init__(self, e1, e2, cost, MSS):
-        """Create queues. e1 & e2 are addresses of the 2 endpoints of the link"""
-        self.q12 = queue.Queue()
-        self.q21 = queue.Queue()
+    def __init__(self, e1, e2, cost, MSS, params=None):
+        """Create delay heaps. e1 & e2 are addresses of the 2 endpoints of the link"""
+        self.q12 = []           # heap of (arrival time, send order, packet) from e1 to e2
+        self.q21 = []           # heap of (arrival time, send order, packet) from e2 to e1
         self.cost = cost
         self.latency = cost
         self.MSS = MSS
         self.e1 = e1
         self.e2 = e2
 
+        params = params or {}
+        self.jitter = params.get("jitter", 0)
+        self.reorder = params.get("reorder", 0)
+        self.reorderDelay = params.get("reorderDelay", cost)
+        self.rng = random.Random(params.get("seed"))
+        self.order = itertools.count()   # keeps packets with equal arrival times in send order
+        self.lock = threading.Lock()
+
+
+    def get_e2(self, e1):
+        """Returns the other endpoint of the link"""
+        if self.e1 == e1:
+            return self.e2
+        else:
+            return self.e1
+
+
+    def delay(self):
+        """One-way delay in seconds of the next packet"""
+        d = self.latency
+        if self.jitter:
+            d += self.rng.uniform(0, self.jitter)
+        if self.reorder and self.rng.random() < self.reorder:
+            d += self.reorderDelay
+        return d
+
 
     def send(self, packet, src):
         """Sends 'packet' from 'src' on this link.
@@ -27,13 +63,16 @@ class Link:
            'src' must be equal to self.e1 or self.e2.
         """
         if packet.payload:
-            assert(isinstance((packet.payload), str) and (len(packet.payload)<= self.MSS)), "Packet payload must be a string of length <= " + self.MSS + " bytes"
+            assert(isinstance((packet.payload), str) and (len(packet.payload)<= self.MSS)), "Packet payload must be a string of length <= " + str(self.MSS) + " bytes"
         if src == self.e1:
-            packet.time = time.time()
-            self.q12.put(packet)
+            q = self.q12
         elif src == self.e2:
-            packet.time = time.time()
-            self.q21.put(packet)
+            q = self.q21
+        else:
+            return
+        with self.lock:
+            packet.time = simclock.now()
+            heapq.heappush(q, (packet.time + self.delay(), next(self.order), packet))
 
 
     def recv(self, dst, timeout=None):
@@ -41,27 +80,27 @@ class Link:
            'dst' must be equal to self.e1 or self.e2.
            If packet is ready, returns the packet, else returns 'None'.
         """
-        if dst == self.e1:
-            if not self.q21.empty():
-                currTime = time.time()
-                enqeueTime = self.q21.queue[0].time
-                if currTime - enqeueTime >= self.latency:
-                    packet = self.q21.get_nowait()
-                    return packet
-                else:
-                    return None
-            else:
-                return None
-        elif dst == self.e2:
-            if not self.q12.empty():
-                currTime = time.time()
-                enqeueTime = self.q12.queue[0].time
-                if currTime - enqeueTime >= self.latency:
-                    packet = self.q12.get_nowait()
-                    return packet
-                else:
-                    return None
-            else:
-                return None
+        q = self.q21 if dst == self.e1 else self.q12
+        currTime = simclock.now()
+        with self.lock:
+            if q and q[0][0] <= currTime:
+                return heapq.heappop(q)[2]
+        return None
+
+
+    def recvAll(self, dst):
+        """Returns the list of all packets whose arrival time has passed for 'dst', in arrival order"""
+        q = self.q21 if dst == self.e1 else self.q12
+        currTime = simclock.now()
+        packets = []
+        with self.lock:
+            while q and q[0][0] <= currTime:
+                packets.append(heapq.heappop(q)[2])
+        return packets
 
 
+    def clear(self):
+        """Drop all packets in flight in both directions"""
+        with self.lock:
+            del self.q12[:]
+            del self.q21[:]
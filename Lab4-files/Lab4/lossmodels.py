@@ -0,0 +1,112 @@
+import random
+
+class BernoulliLoss:
+    """Every packet is dropped independently with probability lossProb percent"""
+
+    def __init__(self, lossProb, rng):
+        self.lossProb = lossProb
+        self.rng = rng
+
+
+    def drop(self):
+        return self.rng.randint(0, 99) < self.lossProb
+
+
+    def getStateString(self):
+        return "bernoulli " + str(self.lossProb) + "%"
+
+
+class GilbertElliottLoss:
+    """Bursty loss from a two-state Markov chain (Gilbert-Elliott).
+
+       In the good state packets are dropped with probability 'goodLoss', in the bad state
+       with 'badLoss'. The chain leaves the bad state with probability r = 1/burstLength per
+       packet, so bad periods last 'burstLength' packets on average, and enters it with the
+       probability p that makes the long-run loss rate lossProb percent:
+       pi_bad = p / (p + r) = (loss - goodLoss) / (badLoss - goodLoss). High loss rates
+       need p > 1 with short bursts, so there r is lowered until p = 1: bursts get longer.
+    """
+
+    def __init__(self, lossProb, rng, burstLength=4.0, goodLoss=0.0, badLoss=1.0):
+        self.lossProb = lossProb
+        self.rng = rng
+        self.burstLength = burstLength
+        self.goodLoss = goodLoss
+        self.badLoss = badLoss
+        piBad = min(max((lossProb / 100 - goodLoss) / (badLoss - goodLoss), 0.0), 1.0)
+        self.r = 1 / max(burstLength, 1.0)
+        if piBad >= 1:
+            self.r, self.p = 0.0, 1.0
+        elif piBad > 0:
+            self.r = min(self.r, (1 - piBad) / piBad)
+            self.p = self.r * piBad / (1 - piBad)
+        else:
+            self.p = 0.0
+        self.bad = False
+
+
+    def drop(self):
+        if self.bad:
+            self.bad = self.rng.random() >= self.r
+        else:
+            self.bad = self.rng.random() < self.p
+        return self.rng.random() < (self.badLoss if self.bad else self.goodLoss)
+
+
+    def getStateString(self):
+        return "gilbert " + str(self.lossProb) + "% (p: " + str(round(self.p, 4)) + " r: " + str(round(self.r, 4)) + ")"
+
+
+class TraceLoss:
+    """Replays recorded drop decisions from a file, one per packet, starting over at its end.
+
+       The trace is a sequence of '1' (drop) and '0' (forward) characters; whitespace is
+       ignored and lines starting with '#' are comments.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.trace = []
+        with open(path) as f:
+            for line in f:
+                if line.lstrip().startswith("#"):
+                    continue
+                for c in line:
+                    if c in "01":
+                        self.trace.append(c == "1")
+                    elif not c.isspace():
+                        raise ValueError("Unexpected character in loss trace " + path + ": " + repr(c))
+        if not self.trace:
+            raise ValueError("Empty loss trace: " + path)
+        self.next = 0
+
+
+    def drop(self):
+        dropped = self.trace[self.next]
+        self.next = (self.next + 1) % len(self.trace)
+        return dropped
+
+
+    def getStateString(self):
+        return "trace " + self.path + " (" + str(sum(self.trace)) + "/" + str(len(self.trace)) + " drops)"
+
+
+MODELS = ["bernoulli", "gilbert", "trace"]
+
+
+def makeRNG(seed, name):
+    """A random.Random for component 'name', derived from 'seed' (unseeded if 'seed' is None)"""
+    return random.Random(str(seed) + ":" + name) if seed is not None else random.Random()
+
+
+def makeLossModel(name, lossProb, rng, trace=None, burstLength=4.0):
+    """Create a loss model by name, see MODELS"""
+    if name == "bernoulli":
+        return BernoulliLoss(lossProb, rng)
+    elif name == "gilbert":
+        return GilbertElliottLoss(lossProb, rng, burstLength)
+    elif name == "trace":
+        if trace is None:
+            raise ValueError("The trace loss model needs a trace file")
+        return TraceLoss(trace)
+    raise ValueError("Unknown loss model: " + str(name))
@@ -1,7 +1,18 @@
 #
-import time
 import sys
 import queue
+import simclock
+from rtt import RTTEstimator
+from congestion import makeController, MAX_WINDOW
+from timers import Segment, TimerHeap
+from ringbuffer import RingBuffer
+from filesource import FileSource
+from filesink import OffsetSink
+from integrity import StreamDigest, DigestWriter
+from compression import CompressedSource, DecompressingWriter
+from fec import XOREncoder, XORDecoder
+from intervals import IntervalSet
+from sack import encodeRanges, decodeRanges
 from client import Client
 from packet import Packet
 
@@ -9,12 +20,28 @@ from packet import Packet
 class MyClient(Client):
     """Implement a reliable transport using selective acknowledgments."""
 
-    def __init__(self, addr, sendFile, recvFile, MSS):
-        """Client A is sending bytes from file 'sendFile' to client B.
-           Client B stores the received bytes from A in file 'recvFile'.
+    def __init__(self, addr, sendFile, recvFile, MSS, options=None, peer=None):
+        """A client with a 'sendFile' is a sender ("Client A" below): it sends the bytes of the
+           file to client 'peer'. A client with a 'recvFile' is a receiver ("Client B"): it stores
+           the bytes received from 'peer' in the file. 'peer' defaults to B for A and A otherwise.
+           'options' tunes the sender: "window" (controller name, see congestion.py)
+           "windowSize" (initial window in segments) and "maxWindow" (largest window any controller
+           opens, also the capacity of both ends' ring buffers), and the receiver: "receiver"
+           is "buffer" (reassemble in memory, default) or "offset" (write segments in place).
+           Both ends: "compress" ("zlib" or "lzma", see compression.py) sends the file compressed,
+           "fec" ("xor", see fec.py) adds parity segments, in blocks of "fecK" or adaptive if unset.
+           Retransmission timer: "rto" (initial timeout), "minRTO" and "maxBackoff" (see rtt.py).
+           "crcBlock" adds a CRC-32 per that many bytes to the integrity digests (see integrity.py).
         """
+        options = options or {}
+        compress = options.get("compress")
+        if compress and options.get("receiver") == "offset":
+            raise ValueError("A compressed stream can only be decoded in order, use the buffer receiver")
+        maxWindow = options.get("maxWindow", MAX_WINDOW)
+        if options.get("windowSize", 20) > maxWindow:
+            raise ValueError("The window size " + str(options["windowSize"]) + " is above the largest window " + str(maxWindow) + ", raise maxWindow")
         # initialize superclass
-        Client.__init__(self, addr, sendFile, recvFile, MSS)
+        Client.__init__(self, addr, sendFile, recvFile, MSS, options.get("log", "full"))
 
         # Connection state
         self.connSetup = 0
@@ -22,23 +49,52 @@ class MyClient(Client):
         self.connTerminate = 0
         self.sendFile = sendFile
         self.recvFile = recvFile
+        self.peer = peer or ("B" if addr == "A" else "A")
+        self.isSender = sendFile is not None
+        self.isReceiver = recvFile is not None
 
         # -------------------------------
         # Sender state (Client A) – selective repeat with selective ACKs
         # -------------------------------
         self.base = 1                 # sequence number of the oldest unacknowledged packet
         self.next_seq_num = 1         # sequence number to use for the next new data packet
-        self.window_size = 20         # sending window size
-        self.unacked = {}             # seqNum -> {"packet": pkt, "time": send_time, "acked": bool}
-        self.timeout_interval = 2.0   # retransmission timeout (seconds)
-        self.eof = False              # True when we have read all bytes from sendFile
+        self.window_size = options.get("windowSize", 20)   # initial sending window size
+        self.window = makeController(options.get("window", "fixed"), initial=self.window_size, maxWindow=maxWindow)
+        self.unacked = RingBuffer(maxWindow)    # Segments of the window, marked when acked
+        self.timers = TimerHeap()     # retransmission timers of the segments in 'unacked'
+        self.timeout_interval = options.get("rto", 2.0)   # initial retransmission timeout (seconds), until the first RTT sample
+        # every timeout doubles the RTO up to 'maxBackoff'. Loss here is random rather than
+        # congestion, so waiting longer never helps: backoff is off (1) unless asked for
+        self.rtt = RTTEstimator(initialRTO=self.timeout_interval, minRTO=options.get("minRTO", 1.0),
+                                maxBackoff=options.get("maxBackoff", 1))
+        self.syn_time = None          # send time of our SYN, the handshake gives the first RTT sample
+        self.source = None            # payloads by seqNum
+        if sendFile is not None:
+            blockSize = options.get("crcBlock", 0)
+            self.source = CompressedSource(sendFile, MSS, compress, blockSize) if compress else FileSource(sendFile, MSS, blockSize)
+        self.eof = False              # True when every segment of sendFile has been sent once
+        self.fec = None               # XOREncoder on A, XORDecoder on B when FEC is on
+        if options.get("fec") == "xor":
+            self.fec = XOREncoder(options.get("fecK"), src=addr, dst=self.peer) if sendFile is not None else XORDecoder()
         self.fin_sent = False         # True once FIN has been sent
 
         # -------------------------------
         # Receiver state (Client B)
         # -------------------------------
         self.expected_seq = 1         # next in-order sequence number expected from A
-        self.recv_buffer = {}         # seqNum -> payload (out-of-order buffer)
+        self.recv_buffer = RingBuffer(maxWindow)    # payloads from expected_seq on, marked when received
+        self.digest = StreamDigest(options.get("crcBlock", 0))   # of the bytes delivered in order
+        self.sink = None              # OffsetSink that replaces recv_buffer in "offset" mode
+        if recvFile is not None and options.get("receiver", "buffer") == "offset":
+            self.sink = OffsetSink(recvFile, MSS, digest=self.digest)
+        self.output = None            # where in-order payloads go
+        if recvFile is not None:
+            self.output = DigestWriter(recvFile, self.digest)
+        self.received = IntervalSet() # every seqNum received so far, for the SACK ranges
+        self.arrived = []             # seqNums received since the last ACK, newest last
+        if recvFile is not None and compress:
+            self.output = DecompressingWriter(self.output, compress)
+        self.finDigest = None         # self.digest once the FIN arrived, the stream is then complete
 
     # ----------------------------------------------------------------------
     # Receiving side (called every 0.1 seconds by the network)
@@ -50,31 +106,43 @@ class MyClient(Client):
         if not self.link:
             return
 
-        packet = self.link.recv(self.addr)  # receive a packet from the link
-        if not packet:
-            return
+        # receive every packet that has arrived since the last call
+        for packet in self.link.recvAll(self.addr):
+            self.handleRecvdPacket(packet)
+
+        # Client B acknowledges all data segments of this tick with one ACK
+        if self.arrived:
+            self.sendAck()
 
+    def handleRecvdPacket(self, packet):
+        """Handle one packet recvd from the network"""
         # log recvd packet
-        self.f.write(
-            "Packet - srcAddr: " + packet.srcAddr +
-            " dstAddr: " + packet.dstAddr +
-            " seqNum: " + str(packet.seqNum) +
-            " ackNum: " + str(packet.ackNum) +
-            " SYNFlag: " + str(packet.synFlag) +
-            " ACKFlag: " + str(packet.ackFlag) +
-            " FINFlag: " + str(packet.finFlag) +
-            " Payload: " + str(packet.payload)
-        )
-        self.f.write("\n")
+        self.recvdPktCnt += 1
+        if self.log.headers:
+            line = (
+                "Packet - srcAddr: " + packet.srcAddr +
+                " dstAddr: " + packet.dstAddr +
+                " seqNum: " + str(packet.seqNum) +
+                " ackNum: " + str(packet.ackNum) +
+                " SYNFlag: " + str(packet.synFlag) +
+                " ACKFlag: " + str(packet.ackFlag) +
+                " FINFlag: " + str(packet.finFlag)
+            )
+            if self.log.full:
+                line += " Payload: " + str(packet.payload)
+            self.log.write(line + "\n")
 
         # --------------------------------------------------------------
         # Client A: sender of the file
         # --------------------------------------------------------------
-        if self.addr == "A":
+        if self.isSender:
             # Connection setup complete: received SYN-ACK
             if packet.synFlag == 1 and packet.ackFlag == 1 and packet.finFlag == 0:
+                if self.syn_time is not None:
+                    self.sampleRTT(simclock.now() - self.syn_time)
+                    self.syn_time = None
                 # send final ACK of 3-way handshake
-                ack_pkt = Packet("A", "B", 1, packet.seqNum + 1, 0, 1, 0, None)
+                ack_pkt = Packet(self.addr, self.peer, 1, packet.seqNum + 1, 0, 1, 0, None)
                 if self.link:
                     self.link.send(ack_pkt, self.addr)
                 self.connEstablished = 1
@@ -84,36 +152,53 @@ class MyClient(Client):
             # Connection termination: received FIN-ACK from B
             if packet.finFlag == 1 and packet.ackFlag == 1:
                 # send final ACK and let router end simulation
-                ack_pkt = Packet("A", "B", 0, packet.seqNum + 1, 0, 1, 0, None)
+                ack_pkt = Packet(self.addr, self.peer, 0, packet.seqNum + 1, 0, 1, 0, None)
                 if self.link:
                     self.link.send(ack_pkt, self.addr)
                 self.connTerminate = 0
                 return
 
-            # Data ACKs from B (selective ACK)
+            # Data ACKs from B: cumulative ACK in ackNum, SACK ranges in the payload
             if (
                 packet.ackFlag == 1 and
                 packet.synFlag == 0 and
-                packet.finFlag == 0 and
-                packet.payload is None
+                packet.finFlag == 0
             ):
-                ack_seq = packet.ackNum
-                # Mark the corresponding packet as acknowledged
-                if ack_seq in self.unacked:
-                    self.unacked[ack_seq]["acked"] = True
+                cum_ack = packet.ackNum
+                newest = None
+                progress = False
+                # Mark every segment below the cumulative ACK or inside a SACK range as acknowledged
+                for start, end in [(self.base, cum_ack)] + decodeRanges(cum_ack, packet.payload):
+                    for seq in range(max(start, self.base), min(end, self.next_seq_num)):
+                        if self.unacked.mark(seq):
+                            seg = self.unacked.get(seq)
+                            seg.acked = True
+                            progress = True
+                            self.window.onAck(seq, seg.sends)
+                            if self.fec is not None:
+                                self.fec.onAck(seg.sends)
+                            # Karn's rule: the ACK of a retransmitted segment is ambiguous, do not sample it
+                            if seg.sends == 1 and (newest is None or seg.time > newest):
+                                newest = seg.time
+                if newest is not None:
+                    # the most recently sent segment gives the sample least inflated by earlier ACK losses
+                    self.sampleRTT(simclock.now() - newest)
+                if progress:
+                    self.rtt.acked()
 
                 # Slide the sending window base forward
-                while self.base in self.unacked and self.unacked[self.base]["acked"]:
-                    del self.unacked[self.base]
-                    self.base += 1
+                if self.unacked.isMarked(self.base):
+                    self.unacked.advance()
+                    self.base = self.unacked.base
+                    self.source.release(self.base)
 
         # --------------------------------------------------------------
         # Client B: receiver of the file
         # --------------------------------------------------------------
-        if self.addr == "B":
+        if self.isReceiver:
             # Received a SYN packet: start connection setup
             if packet.synFlag == 1 and packet.finFlag == 0 and packet.ackFlag == 0:
-                syn_ack = Packet("B", "A", 0, packet.seqNum + 1, 1, 1, 0, None)
+                syn_ack = Packet(self.addr, self.peer, 0, packet.seqNum + 1, 1, 1, 0, None)
                 if self.link:
                     self.link.send(syn_ack, self.addr)
                 self.connSetup = 1
@@ -121,9 +206,10 @@ class MyClient(Client):
 
             # Received a FIN packet from A: begin termination
             if packet.finFlag == 1 and packet.synFlag == 0 and packet.ackFlag == 1:
-                fin_ack = Packet("B", "A", 0, packet.seqNum + 1, 0, 1, 1, None)
+                fin_ack = Packet(self.addr, self.peer, 0, packet.seqNum + 1, 0, 1, 1, None)
                 if self.link:
                     self.link.send(fin_ack, self.addr)
+                self.finishReceive()
                 self.connTerminate = 1
                 return
 
@@ -155,26 +241,90 @@ class MyClient(Client):
                 packet.synFlag == 0 and
                 packet.finFlag == 0
             ):
-                seq = packet.seqNum
+                if packet.seqNum < 0:
+                    # parity segment: it may rebuild the one missing segment of its block
+                    rebuilt = self.fec.addParity(packet, self.expected_seq) if self.fec is not None else []
+                else:
+                    rebuilt = [(packet.seqNum, packet.payload)]
+                while rebuilt:
+                    seq, payload = rebuilt.pop()
+                    if self.recvData(seq, payload) and self.fec is not None:
+                        rebuilt += self.fec.addData(seq, payload, self.expected_seq)
 
-                # Always send a selective ACK for the sequence number we received
-                ack_pkt = Packet("B", "A", 0, seq, 0, 1, 0, None)
-                if self.link:
-                    self.link.send(ack_pkt, self.addr)
+    def recvData(self, seq, payload):
+        """Client B: ACK and store data segment 'seq', delivering what is now in order.
+           Returns False if the segment was dropped because it does not fit the reassembly buffer.
+        """
+        # Beyond the reassembly buffer: drop without an ACK, A will send it again
+        if self.sink is None and seq >= self.expected_seq + self.recv_buffer.capacity:
+            return False
+
+        # Every received segment is acknowledged by the next coalesced ACK
+        self.received.add(seq, seq + 1)
+        self.arrived.append(seq)
+
+        # If this is a duplicate (already delivered), do not store again
+        if seq < self.expected_seq:
+            return True
 
-                # If this is a duplicate (already delivered), do not store again
-                if seq < self.expected_seq:
-                    return
+        # Offset mode: write the segment at its place in the file, holes are filled later
+        if self.sink is not None:
+            if self.sink.put(seq, payload) and seq == self.expected_seq:
+                self.expected_seq = self.sink.contiguous(seq)
+            return True
 
-                # Buffer out-of-order packet
-                if seq not in self.recv_buffer:
-                    self.recv_buffer[seq] = packet.payload
+        # Buffer out-of-order packet
+        if not self.recv_buffer.isMarked(seq):
+            self.recv_buffer.put(seq, payload)
+            self.recv_buffer.mark(seq)
 
-                # Deliver any newly in-order data
-                while self.expected_seq in self.recv_buffer:
-                    self.recvFile.write(self.recv_buffer[self.expected_seq])
-                    del self.recv_buffer[self.expected_seq]
-                    self.expected_seq += 1
+        # Deliver any newly in-order data
+        if seq == self.expected_seq:
+            for payload in self.recv_buffer.advance():
+                self.output.write(payload)
+            self.expected_seq = self.recv_buffer.base
+        return True
+
+    def finishReceive(self):
+        """Client B: the stream is complete, write out what is still staged. Runs once"""
+        if self.finDigest is not None:
+            return
+        if self.sink is not None:
+            self.sink.flush()
+        if isinstance(self.output, DecompressingWriter):
+            self.output.finish()
+        self.finDigest = self.digest
+
+    def sendAck(self):
+        """Client B: one ACK for all data segments received since the last one. ackNum is the
+           cumulative ACK (every seqNum below it was received) and the payload lists the received
+           ranges above it, starting with those holding the newest arrivals (see sack.py).
+        """
+        ranges, seen = [], set()
+        for seq in reversed(self.arrived):
+            r = self.received.find(seq)
+            if r[0] > self.expected_seq and r not in seen:
+                ranges.append(r)
+                seen.add(r)
+        self.arrived = []
+        ack_pkt = Packet(self.addr, self.peer, 0, self.expected_seq, 0, 1, 0, encodeRanges(self.expected_seq, ranges, self.MSS))
+        if self.link:
+            self.link.send(ack_pkt, self.addr)
+
+    def sampleRTT(self, rtt):
+        """Feed a round-trip time measurement to the RTO estimator and log its state"""
+        self.rtt.sample(rtt)
+        if self.log.headers:
+            self.log.write("RTT - sample: " + str(round(rtt, 3)) + " " + self.rtt.getStateString() + " window: " + self.window.getStateString() + "\n")
+
+    def dataPacket(self, seq):
+        """Build data segment 'seq', for its first send or a retransmission"""
+        return Packet(self.addr, self.peer, seq, 0, 0, 0, 0, self.source.payload(seq))
+
+    def sendParity(self, parity_pkt):
+        """Send an FEC parity segment, if a block was completed"""
+        if parity_pkt is not None and self.link:
+            self.link.send(parity_pkt, self.addr)
 
     # ----------------------------------------------------------------------
     # Sending side (called every 0.1 seconds by the network)
@@ -186,58 +336,73 @@ class MyClient(Client):
         # --------------------------------------------------------------
         # Client A: sender of the file
         # --------------------------------------------------------------
-        if self.addr == "A":
+        if self.isSender:
             # Initiate connection setup with a SYN (once)
             if self.connSetup == 0 and self.connEstablished == 0:
-                syn_pkt = Packet("A", "B", 0, 0, 1, 0, 0, None)
+                syn_pkt = Packet(self.addr, self.peer, 0, 0, 1, 0, 0, None)
                 if self.link:
                     self.link.send(syn_pkt, self.addr)
+                    self.syn_time = simclock.now()
                 self.connSetup = 1
                 # Do not send data in the same tick as SYN
                 return
 
             # Only send/recv data after connection established and before termination
             if self.connEstablished == 1 and self.connTerminate == 0:
-                now = time.time()
+                now = simclock.now()
 
                 # 1. Retransmit any timed-out unacked data packets (selective repeat)
-                for seq, info in list(self.unacked.items()):
-                    if not info["acked"] and (now - info["time"] > self.timeout_interval):
-                        if self.link:
-                            self.link.send(info["packet"], self.addr)
-                        info["time"] = time.time()
+                expired = False
+                for seg in self.timers.expired(now, self.rtt.getRTO()):
+                    data_pkt = self.dataPacket(seg.seq)
+                    if self.link:
+                        self.link.send(data_pkt, self.addr)
+                    if self.fec is not None:
+                        self.sendParity(self.fec.repair(seg.seq, data_pkt.payload))
+                    seg.time = simclock.now()
+                    seg.sends += 1
+                    self.timers.start(seg)
+                    self.window.onLoss(seg.seq, self.next_seq_num)
+                    if self.fec is not None:
+                        self.fec.onLoss()
+                    expired = True
+                # one doubling per tick with expiries, however many segments were sent together
+                if expired:
+                    self.rtt.timedOut()
 
                 # 2. Send new data packets while there is space in the window
-                while (not self.eof) and (self.next_seq_num < self.base + self.window_size):
-                    content = self.sendFile.read(self.MSS)
-                    if not content:
-                        # No more data to read from file
+                while (not self.eof) and (self.next_seq_num < self.base + self.window.getWindow()):
+                    if not self.source.has(self.next_seq_num):
+                        # No more data in the file: protect the last, partial FEC block
                         self.eof = True
+                        if self.fec is not None:
+                            self.sendParity(self.fec.flush())
                         break
 
-                    data_pkt = Packet("A", "B", self.next_seq_num, 0, 0, 0, 0, content)
+                    data_pkt = self.dataPacket(self.next_seq_num)
                     if self.link:
                         self.link.send(data_pkt, self.addr)
+                    if self.fec is not None:
+                        self.sendParity(self.fec.add(self.next_seq_num, data_pkt.payload))
 
-                    self.unacked[self.next_seq_num] = {
-                        "packet": data_pkt,
-                        "time": time.time(),
-                        "acked": False,
-                    }
+                    seg = Segment(self.next_seq_num, simclock.now())
+                    self.unacked.put(self.next_seq_num, seg)
+                    self.timers.start(seg)
                     self.next_seq_num += 1
 
                 # 3. If we have reached EOF and all data is acked, send FIN
-                if self.eof and (not self.unacked) and not self.fin_sent:
-                    fin_pkt = Packet("A", "B", 0, 0, 0, 1, 1, None)
+                if self.eof and self.next_seq_num == self.base and not self.fin_sent:
+                    fin_pkt = Packet(self.addr, self.peer, 0, 0, 0, 1, 1, None)
                     if self.link:
                         self.link.send(fin_pkt, self.addr)
                     self.fin_sent = True
                     self.connTerminate = 1
+                    self.source.close()
 
         # --------------------------------------------------------------
         # Client B: receiver of the file
         # --------------------------------------------------------------
-        if self.addr == "B":
+        if self.isReceiver:
             # B only sends control/ACK packets from handleRecvdPackets.
             # Nothing to do here periodically.
             pass
@@ -3,22 +3,51 @@ import sys
 import threading
 import json
 import signal
-import time
 import os.path
 import queue
-import filecmp
+import heapq
+import argparse
+import simclock
 from collections import defaultdict
 from client import Client
 from myClient import MyClient
+from congestion import CONTROLLERS, MAX_WINDOW
+from compression import METHODS as COMPRESSION_METHODS
 from link import Link
+from lossmodels import MODELS as LOSS_MODELS, makeLossModel, makeRNG
+from integrity import compareDigests
 from router import Router
+from pktlog import LEVELS as LOG_LEVELS
+
+def openRecvFile(path):
+    """Open a receive file: payloads carry one latin-1 character per file byte, and the file
+       is readable for the offset receiver's digest"""
+    return open(path, 'w+', encoding='latin-1', newline='')
+
 
 class Network:
     """Network class maintains all clients, routers, links, and confgurations"""
 
-    def __init__(self, netJsonFilepath, sendFile, recvFile, lossProb):
-        """Create a new network from the parameters in the 'netJsonFilepath' file"""
+    def __init__(self, netJsonFilepath, sendFile, recvFile, lossProb, virtual=False, clientOptions=None, lossOptions=None, logLevel="full"):
+        """Create a new network from the parameters in the 'netJsonFilepath' file.
+           If 'virtual' is set, the network runs on a simulated clock instead of threads.
+           'clientOptions' is passed on to every MyClient.
+           'lossOptions' picks the routers' loss model: "model" (see lossmodels.py), "seed",
+           "trace" (file for the trace model) and "burst" (mean burst length for gilbert).
+           With a seed, every router and link draws from its own RNG derived from it.
+           'logLevel' sets the packet dumps and console output of routers and clients (see pktlog.py).
+           'sendFile' and 'recvFile' are the files of the flows that do not name their own.
+           Besides routers, clients, MSS and links the file may hold "flows" (see parseFlows),
+           "routes" (see parseRoutes) and "loss" (loss percent by router, instead of 'lossProb').
+        """
+        self.logLevel = logLevel
+        self.clientOptions = dict(clientOptions or {}, log=logLevel)
+        self.lossOptions = lossOptions or {}
+        self.seed = self.lossOptions.get("seed")
         self.threads = []
+        self.virtual = virtual
+        if virtual:
+            simclock.useVirtualClock()
 
         # parse configuration details
         netJsonFile = open(netJsonFilepath, 'r')
@@ -26,40 +55,114 @@ class Network:
         self.sendFile = sendFile
         self.recvFile = recvFile
 
-        # parse and create routers, clients, and links
-        self.routers = self.parserouters(netJson["routers"], lossProb)
+        # parse and create flows, routers, clients, and links
+        self.flows = self.parseFlows(netJson.get("flows", [["A", "B"]]))
+        self.routers = self.parserouters(netJson["routers"], lossProb, netJson["links"], netJson.get("routes", {}), netJson.get("loss", {}))
         self.clients = self.parseClients(netJson["clients"], netJson["MSS"])
         self.links = self.parseLinks(netJson["links"], netJson["MSS"])
 
         netJsonFile.close()
 
 
-    def parserouters(self, routerParams, lossProb):
-        """Parse routers from 'routerParams' dict"""
+    def parserouters(self, routerParams, lossProb, linkParams, routeParams, lossParams):
+        """Parse routers from 'routerParams' dict. 'lossParams' ({router: loss percent}) overrides
+           'lossProb' per router, and 'routeParams' the computed routing tables (see parseRoutes).
+        """
+        routes = self.parseRoutes(routerParams, linkParams, routeParams)
+        ingress = defaultdict(int)     # flows entering the network at each router
+        for flow in self.flows:
+            for params in linkParams:
+                if flow["src"] in params[:2]:
+                    ingress[params[1] if params[0] == flow["src"] else params[0]] += 1
         routers = {}
         for addr in routerParams:
-            assert(addr == "1")
-            routers[addr] = Router(addr, lossProb)
+            loss = lossParams.get(addr, lossProb)
+            assert(0 <= loss <= 99)
+            lossModel = makeLossModel(self.lossOptions.get("model", "bernoulli"), loss, makeRNG(self.seed, "router-" + addr),
+                                      self.lossOptions.get("trace"), self.lossOptions.get("burst", 4.0))
+            routers[addr] = Router(addr, loss, lossModel, self.logLevel, ingress[addr], routes[addr])
         return routers
 
 
+    def parseRoutes(self, routerParams, linkParams, routeParams):
+        """Static routing tables of the routers: next hop address by destination address.
+           Shortest paths over the link costs, only crossing routers (clients do not forward);
+           the entries in 'routeParams' ({router: {destination: next hop}}) replace computed ones.
+        """
+        graph = defaultdict(dict)
+        for params in linkParams:
+            addr1, addr2, c = params[0], params[1], params[4]
+            graph[addr1][addr2] = graph[addr2][addr1] = c
+        routes = {}
+        for addr in routerParams:
+            table, seen = {}, set()
+            heap = [(0, addr, None)]    # (path cost, node, first hop)
+            while heap:
+                d, node, hop = heapq.heappop(heap)
+                if node in seen:
+                    continue
+                seen.add(node)
+                if hop is not None:
+                    table[node] = hop
+                if node != addr and node not in routerParams:
+                    continue
+                for nbr, c in graph[node].items():
+                    if nbr not in seen:
+                        heapq.heappush(heap, (d + c, nbr, hop if hop is not None else nbr))
+            table.update(routeParams.get(addr, {}))
+            routes[addr] = table
+        return routes
+
+
+    def parseFlows(self, flowParams):
+        """Parse flows from 'flowParams' list. A flow is [sender, receiver] with optional send and
+           recv file paths; without them it sends the command line's send file. The first flow
+           writes the command line's recv file, the others a file next to it named after the flow.
+           Without a "flows" entry the network has the one flow from A to B.
+        """
+        flows = []
+        for i, params in enumerate(flowParams):
+            src, dst = params[:2]
+            sendFile = open(params[2], 'rb') if len(params) > 2 else self.sendFile
+            if len(params) > 3:
+                recvFile = openRecvFile(params[3])
+            elif i == 0:
+                recvFile = self.recvFile
+            else:
+                recvFile = openRecvFile(self.recvFile.name + "." + src + "-" + dst)
+            flows.append({"src": src, "dst": dst, "sendFile": sendFile, "recvFile": recvFile})
+        return flows
+
+
     def parseClients(self, clientParams, MSS):
-        """Parse clients from 'clientParams' dict"""
+        """Parse clients from 'clientParams' dict. Each client is the sender or the receiver
+           of at most one flow; the others only take part in the network.
+        """
+        roles = {}
+        for flow in self.flows:
+            assert(flow["src"] not in roles and flow["dst"] not in roles and flow["src"] != flow["dst"])
+            roles[flow["src"]] = (flow["sendFile"], None, flow["dst"])
+            roles[flow["dst"]] = (None, flow["recvFile"], flow["src"])
         clients = {}
         for addr in clientParams:
-            assert(addr == "A" or addr == "B")
-            if addr == "A":
-                clients[addr] = MyClient(addr, self.sendFile, None, MSS)
-            elif addr == "B":
-                clients[addr] = MyClient(addr, None, self.recvFile, MSS)
+            sendFile, recvFile, peer = roles.get(addr, (None, None, None))
+            clients[addr] = MyClient(addr, sendFile, recvFile, MSS, self.clientOptions, peer)
         return clients
 
 
     def parseLinks(self, linkParams, MSS):
-        """Parse links from 'linkParams' dict"""
+        """Parse links from 'linkParams' dict. An optional 6th element holds the link's jitter/reorder params"""
         links = {}
-        for addr1, addr2, p1, p2, c in linkParams:
-            link = Link(addr1, addr2, c, MSS)
+        ports = set()
+        for params in linkParams:
+            addr1, addr2, p1, p2, c = params[:5]
+            for addr, port in ((addr1, p1), (addr2, p2)):
+                assert(addr not in self.routers or (addr, port) not in ports)   # one link per router port
+                ports.add((addr, port))
+            linkParams = dict(params[5]) if len(params) > 5 else {}
+            if self.seed is not None and "seed" not in linkParams:
+                linkParams["seed"] = str(self.seed) + ":link-" + addr1 + "-" + addr2
+            link = Link(addr1, addr2, c, MSS, linkParams)
             links[(addr1,addr2)] = (p1, p2, c, link)
         return links
 
@@ -72,12 +175,105 @@ class Network:
         return changes
 
 
-    def run(self, f1, f2):
+    def run(self):
         """Run the network. Start threads for each client and router.
            Start thread to track link changes.
-           Wait until end time and then print the final output.
+           Wait until end time and then print the final output. The files are checked by
+           comparing the digests sender and receiver computed while sending and delivering the data.
+           With several flows, each flow's bytes, time and goodput are printed first, with
+           Jain's fairness index of the goodputs and the aggregate goodput.
         """
-        start = time.time()
+        start = simclock.now()
+        if self.virtual:
+            self.runVirtual()
+        else:
+            self.runThreads()
+        for node in list(self.routers.values()) + list(self.clients.values()):
+            node.closeLog()
+
+        results = [self.checkFlow(flow, start) for flow in self.flows]
+        if len(self.flows) > 1:
+            print()
+            for r in results:
+                print("Flow " + r["name"] + ": " + str(r["bytes"]) + " bytes sent (" + str(r["pkts"]) + " pkts, " + str(r["dropped"]) + " dropped), time " +
+                      str(round(r["time"], 3)) + " s, goodput " + str(round(r["goodput"], 1)) + " bytes/s, " + ("files match" if r["ok"] else "MISMATCH: " + r["detail"]))
+            goodputs = [r["goodput"] for r in results]
+            fairness = sum(goodputs) ** 2 / (len(goodputs) * sum(g * g for g in goodputs)) if any(goodputs) else 0.0
+            longest = max(r["time"] for r in results)
+            aggregate = sum(r["size"] for r in results) / longest if longest > 0 else 0.0
+            print("Fairness index (Jain) = " + str(round(fairness, 4)) + " over " + str(len(results)) + " flows, aggregate goodput = " +
+                  str(round(aggregate, 1)) + " bytes/s")
+        print("\nTotal bytes sent = " + str(sum(r["bytes"] for r in results)) + " bytes (" + str(sum(r["pkts"] for r in results)) + " pkts)")
+        print("Total time of transfer = " + str(round(max(r["time"] for r in results), 3)) + " seconds")
+        if self.clientOptions.get("fec"):
+            for flow in self.flows:
+                print(self.getFECString(flow))
+
+        files = [self.sendFile, self.recvFile] + [flow[f] for flow in self.flows for f in ("sendFile", "recvFile")]
+        for f in set(files):
+            f.close()
+        failed = [r for r in results if not r["ok"]]
+        if len(results) == 1:
+            detail = results[0]["detail"]
+        else:
+            detail = str(len(results) - len(failed)) + "/" + str(len(results)) + " flows match" + (", " + ", ".join(r["name"] for r in failed) + " do not" if failed else "")
+        if not failed:
+            print("SUCCESS: Sent and received files match! (" + detail + ")")
+        else:
+            print("FAILURE: Sent and received files do not match! (" + detail + ")")
+
+
+    def checkFlow(self, flow, start):
+        """Finish the receiver of 'flow' and compare the digests. Returns the flow's results"""
+        sender, receiver = self.clients[flow["src"]], self.clients[flow["dst"]]
+        stats = self.flowStats(flow)
+        # the router ends a flow on the sender's final ACK, sent once the receiver answered the
+        # FIN, so the receiver has finished its stream. Should a run end between the two anyway,
+        # the stream is still complete once the FIN is out: the sender only sends it when every
+        # segment is acknowledged.
+        if sender.fin_sent:
+            receiver.finishReceive()
+        if receiver.finDigest is None:
+            ok, detail = False, flow["src"] + " never sent the FIN"
+        else:
+            ok, detail = compareDigests(sender.source.digest, receiver.finDigest)
+        end = stats.endTime if stats is not None and stats.endTime is not None else simclock.now()
+        size = sender.source.digest.size
+        return {
+            "name": flow["src"] + "->" + flow["dst"],
+            "bytes": stats.recvdByteCnt if stats is not None else 0,
+            "pkts": stats.recvdPktCnt if stats is not None else 0,
+            "dropped": stats.droppedPktCnt if stats is not None else 0,
+            "time": end - start,
+            "size": size,
+            "goodput": size / (end - start) if end > start else 0.0,
+            "ok": ok,
+            "detail": detail,
+        }
+
+
+    def flowStats(self, flow):
+        """The router's Flow record of 'flow', from the router the sender is attached to"""
+        for router in self.routers.values():
+            if flow["src"] in router.ports:
+                return router.flows.get((flow["src"], flow["dst"]))
+        return None
+
+
+    def getFECString(self, flow):
+        """Parity overhead at the sender and segments rebuilt at the receiver of 'flow'"""
+        enc, dec = self.clients[flow["src"]].fec, self.clients[flow["dst"]].fec
+        return ("FEC" + (" " + flow["src"] + "->" + flow["dst"] if len(self.flows) > 1 else "") + ": " + str(enc.paritySent) +
+                " parity segments (" + str(enc.parityBytes) + " payload bytes), " + str(dec.recovered) + " segments rebuilt")
+
+
+    def finished(self):
+        """True once every router that flows enter the network at has seen them end"""
+        return all(router.endSimulation == 1 for router in self.routers.values() if router.expectedFlows > 0)
+
+
+    def runThreads(self):
+        """Run routers and clients in their own threads in real time until the routers end the simulation"""
         for router in self.routers.values():
             thread = router_thread(router)
             thread.start()
@@ -88,23 +284,28 @@ class Network:
             self.threads.append(thread)
         self.addLinks()
         signal.signal(signal.SIGINT, self.handleInterrupt)
-        while True:
-            if self.routers["1"].endSimulation == 1:
-                self.joinAll()
-                end = time.time()
-                print("\nTotal bytes sent = " + str(self.routers["1"].recvdByteCnt) + " bytes (" + str(self.routers["1"].recvdPktCnt) + " pkts)")
-                print("Total time of transfer = " + str(round(end-start, 3)) + " seconds")
-                self.sendFile.close()
-                self.recvFile.close()
-                time.sleep(1)
-                result = filecmp.cmp(f1, f2, shallow=False)
-                if result == True:
-                    print("SUCCESS: Sent and received files match!")
-                else:
-                    print("FAILURE: Sent and received files do not match!")
+        for router in self.routers.values():
+            if router.expectedFlows > 0:
+                router.done.wait()
+        self.joinAll()
+
+
+    def runVirtual(self):
+        """Discrete-event engine: every router and client main loop iteration is an event every
+           simclock.TICK simulated seconds, run in time order on this thread.
+           Transfers take as long in simulated time as they would in real time, without the waiting.
+        """
+        clock = simclock.clock
+        self.addLinks()
+        nodes = [router.tick for router in self.routers.values()] + [client.tick for client in self.clients.values()]
+        events = [(1, i) for i in range(len(nodes))]     # (tick number, node) - threads sleep before their first run
+        while events:
+            n, i = heapq.heappop(events)
+            clock.now = n * simclock.TICK
+            nodes[i]()
+            if self.finished():
                 return
-            else:
-                time.sleep(5)
+            heapq.heappush(events, (n + 1, i))
 
 
     def addLinks(self):
@@ -133,20 +334,48 @@ class Network:
 
 def main():
     """Main function parses command line arguments and runs the network"""
-    if len(sys.argv) < 4:
-        sys.stdout.write("Usage: python network.py [networkSimulationFile.json] [send file path] [recv file path] [loss probability]")
-        return
-    netCfgFilepath = sys.argv[1]
-    f1 = sys.argv[2]
-    f2 = sys.argv[3]
-    lossProb = int(sys.argv[4])
-    if lossProb < 0 or lossProb > 99:
+    parser = argparse.ArgumentParser(usage="python network.py [networkSimulationFile.json] [send file path] [recv file path] [loss probability] [options]")
+    parser.add_argument("netCfgFilepath")
+    parser.add_argument("sendFile")
+    parser.add_argument("recvFile")
+    parser.add_argument("lossProb", type=int)
+    parser.add_argument("--virtual", action="store_true", help="run on a simulated clock; times are reported in simulated seconds")
+    parser.add_argument("--window", choices=sorted(CONTROLLERS), default="fixed", help="sending window controller (default: fixed)")
+    parser.add_argument("--window-size", type=int, default=20, help="initial sending window in segments (default: 20)")
+    parser.add_argument("--max-window", type=int, default=MAX_WINDOW, help="largest window the controllers open in segments, sizes the send and receive buffers (default: " + str(MAX_WINDOW) + ")")
+    parser.add_argument("--rto", type=float, default=2.0, help="retransmission timeout in seconds until the first RTT sample (default: 2)")
+    parser.add_argument("--min-rto", type=float, default=1.0, help="lower bound of the retransmission timeout in seconds (default: 1)")
+    parser.add_argument("--max-backoff", type=int, default=1, help="largest factor consecutive timeouts double the timeout up to; 1 disables backoff (default: 1)")
+    parser.add_argument("--receiver", choices=["buffer", "offset"], default="buffer", help="reassemble in memory or write segments at their file offset (default: buffer)")
+    parser.add_argument("--compress", choices=COMPRESSION_METHODS, help="send the file compressed with this method")
+    parser.add_argument("--fec", choices=["xor"], help="send XOR parity segments so B can rebuild single losses per block")
+    parser.add_argument("--fec-k", type=int, help="data segments per FEC block (default: adapt to the loss rate)")
+    parser.add_argument("--crc-block", type=int, default=0, help="also checksum every this many bytes to locate corruption (default: off)")
+    parser.add_argument("--loss-model", choices=LOSS_MODELS, default="bernoulli", help="how the router drops packets (default: bernoulli)")
+    parser.add_argument("--seed", type=int, help="seed the loss and link RNGs; with --virtual, runs with the same seed are identical")
+    parser.add_argument("--trace", help="file of 0/1 drop decisions, one per packet, for --loss-model trace")
+    parser.add_argument("--burst", type=float, default=4.0, help="mean loss burst length in packets for --loss-model gilbert (default: 4)")
+    parser.add_argument("--log", choices=LOG_LEVELS, default="full", help="packet dumps and console marks: off (counters only), summary, headers (no payloads) or full (default)")
+    args = parser.parse_args()
+    if args.loss_model == "trace" and args.trace is None:
+        parser.error("--loss-model trace needs --trace")
+    if args.window_size > args.max_window:
+        parser.error("--window-size is above --max-window (" + str(args.max_window) + ")")
+    if args.compress and args.receiver == "offset":
+        parser.error("--compress needs the buffer receiver")
+    if args.lossProb < 0 or args.lossProb > 99:
         print("Error: Invalid loss probability value provided!")
         return
-    sendFile = open(f1, 'r')
-    recvFile = open(f2, 'w')
-    net = Network(netCfgFilepath, sendFile, recvFile, lossProb)
-    net.run(f1, f2)
+    f1 = args.sendFile
+    f2 = args.recvFile
+    sendFile = open(f1, 'rb')
+    recvFile = openRecvFile(f2)
+    clientOptions = {"window": args.window, "windowSize": args.window_size, "maxWindow": args.max_window, "rto": args.rto, "minRTO": args.min_rto,
+                     "maxBackoff": args.max_backoff, "receiver": args.receiver, "compress": args.compress,
+                     "fec": args.fec, "fecK": args.fec_k, "crcBlock": args.crc_block}
+    lossOptions = {"model": args.loss_model, "seed": args.seed, "trace": args.trace, "burst": args.burst}
+    net = Network(args.netCfgFilepath, sendFile, recvFile, args.lossProb, args.virtual, clientOptions, lossOptions, args.log)
+    net.run()
     return
 
 # Extensions of threading.Thread class
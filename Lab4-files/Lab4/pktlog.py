@@ -0,0 +1,46 @@
+import sys
+
+LEVELS = ["off", "summary", "headers", "full"]
+
+BUFFER = 1 << 20        # bytes buffered before a dump file is written out
+
+
+class PacketLog:
+    """Packet dump file and console progress marks of one node, at a log level:
+         off     : nothing is written, the node only keeps its counters
+         summary : one summary line per node at the end, no per-packet output
+         headers : a dump line per packet without the payload, and progress marks
+         full    : a dump line per packet with the payload, and progress marks
+       Callers test 'headers' and 'full' before formatting a line, so the quieter levels
+       do not pay for building strings. Dump files are written through a large buffer
+       and progress marks are only flushed when stdout is a terminal.
+    """
+
+    def __init__(self, path, level="full"):
+        self.level = LEVELS.index(level)
+        self.headers = self.level >= LEVELS.index("headers")
+        self.full = self.level >= LEVELS.index("full")
+        self.f = open(path, "w", buffering=BUFFER) if self.level > 0 else None
+        self.flushMarks = sys.stdout.isatty()
+
+
+    def write(self, text):
+        """Per-packet text, written at the headers and full levels"""
+        if self.headers:
+            self.f.write(text)
+
+
+    def mark(self, text):
+        """Progress mark on the console, at the headers and full levels"""
+        if self.headers:
+            print(text, end='', flush=self.flushMarks)
+
+
+    def close(self, summary=None):
+        """Write the 'summary' line (not at level off) and close the dump file"""
+        if self.f is None:
+            return
+        if summary is not None:
+            self.f.write(summary + "\n")
+        self.f.close()
+        self.f = None
@@ -0,0 +1,61 @@
+class RingBuffer:
+    """Fixed-capacity circular buffer for the sequence numbers [base, base + capacity).
+
+       Slot seq % capacity holds the item of 'seq' and a bitmap (one byte per slot) marks
+       the sequence numbers that are done: acked on the sender side, received on the
+       receiver side. advance() moves 'base' over the marked prefix, so sliding the window
+       neither allocates nor deletes anything.
+    """
+
+    def __init__(self, capacity, base=1):
+        self.capacity = capacity
+        self.base = base
+        self.slots = [None] * capacity
+        self.marks = bytearray(capacity)
+
+
+    def fits(self, seq):
+        """True if 'seq' is inside the buffer's current range"""
+        return self.base <= seq < self.base + self.capacity
+
+
+    def put(self, seq, item):
+        i = seq % self.capacity
+        self.slots[i] = item
+        self.marks[i] = 0
+
+
+    def get(self, seq):
+        """Item of 'seq', None if 'seq' is outside the range or was never put"""
+        if not self.fits(seq):
+            return None
+        return self.slots[seq % self.capacity]
+
+
+    def mark(self, seq):
+        """Mark 'seq' done. Returns False if it was outside the range or already marked"""
+        if not self.fits(seq):
+            return False
+        i = seq % self.capacity
+        if self.marks[i]:
+            return False
+        self.marks[i] = 1
+        return True
+
+
+    def isMarked(self, seq):
+        return self.fits(seq) and self.marks[seq % self.capacity] == 1
+
+
+    def advance(self):
+        """Slide 'base' past all consecutive marked slots and return their items in order"""
+        items = []
+        slots, marks, capacity = self.slots, self.marks, self.capacity
+        i = self.base % capacity
+        while marks[i]:
+            items.append(slots[i])
+            slots[i] = None
+            marks[i] = 0
+            self.base += 1
+            i = self.base % capacity
+        return items
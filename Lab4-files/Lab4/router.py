@@ -3,26 +3,61 @@ import time
 import sys
 import _thread
 import queue
-import random
+import threading
+import simclock
 from link import Link
+from lossmodels import BernoulliLoss, makeRNG
+from pktlog import PacketLog
+
+MARKS = {1: "+", 2: "@"}    # console mark of packets received on a port, "*" for the others
+
+
+class Flow:
+    """Connection state and counters of one sender/receiver pair crossing the router"""
+
+    def __init__(self, src, dst):
+        self.src = src          # address of the sender, whose SYN opened the flow
+        self.dst = dst          # address of the receiver
+        self.connSetup = 0
+        self.connEstablished = 0
+        self.connTerminate = 0
+        self.done = False       # set by the sender's final ACK after the FIN
+        self.endTime = None     # simclock time of the final ACK
+        self.recvdPktCnt = 0
+        self.recvdByteCnt = 0
+        self.droppedPktCnt = 0
+
 
 class Router():
     """Router class"""
 
-    def __init__(self, addr, lossProb):
-        """Initialize Router address and threadsafe queue for link changes"""
+    def __init__(self, addr, lossProb, lossModel=None, logLevel="full", expectedFlows=1, routes=None):
+        """Initialize Router address and threadsafe queue for link changes.
+           'lossModel' decides which packets are dropped (see lossmodels.py), by default
+           each with probability 'lossProb' percent from an unseeded RNG of its own.
+           'logLevel' sets what goes to the packet dump and the console (see pktlog.py).
+           The simulation ends once the 'expectedFlows' flows entering the network here have finished.
+           'routes' is the static routing table: next hop address by destination address.
+           Destinations without an entry are reached on the link to them, if there is one.
+        """
         self.addr = addr       # address of router
         self.links = {}        # links indexed by port, i.e., {port:link, ......, port:link}
+        self.ports = {}        # port of the link to each neighbour, by address
+        self.routes = routes or {}
         self.linkChanges = queue.Queue()
         self.lossProb = lossProb
+        self.lossModel = lossModel or BernoulliLoss(lossProb, makeRNG(None, addr))
         self.keepRunning = True
         self.endSimulation = 0
-        self.connSetup = 0
-        self.connEstablished = 0
-        self.connTerminate = 0
-        self.f = open("logs/Router-"+self.addr+"-recvd-pkts.dump", "w")
+        self.done = threading.Event()  # set with endSimulation, the network waits on it
+        self.endTime = None            # simclock time of the final ACK of the last flow
+        self.flows = {}                # Flow by (sender, receiver)
+        self.expectedFlows = expectedFlows
+        self.finishedFlows = 0         # flows whose sender is attached to this router that have ended
+        self.log = PacketLog("logs/Router-"+self.addr+"-recvd-pkts.dump", logLevel)
         self.recvdPktCnt = 0
         self.recvdByteCnt = 0
+        self.droppedPktCnt = 0
 
 
     def changeLink(self, change):
@@ -36,6 +71,7 @@ class Router():
         """Add new link to router"""
         self.links = {p:link for p,link in self.links.items() if p != port}
         self.links[port] = link
+        self.ports[endpointAddr] = port
 
 
     def removeLink(self, port):
@@ -44,30 +80,33 @@ class Router():
         for p,link in self.links.items():
             if p == port:
                 endpointAddr = link.get_e2(self.addr)
-                while not link.q12.empty():
-                    link.q12.get_nowait()
-                while not link.q21.empty():
-                    link.q21.get_nowait()
+                link.clear()
                 break
         self.links = {p:link for p,link in self.links.items() if p != port}
+        if self.ports.get(endpointAddr) == port:
+            del self.ports[endpointAddr]
 
 
     def runRouter(self):
         """Main loop of router"""
         while self.keepRunning:
-            time.sleep(0.1)
-            try:
-                change = self.linkChanges.get_nowait()
-                if change[0] == "add":
-                    self.addLink(*change[1:])
-                elif change[0] == "remove":
-                    self.removeLink(*change[1:])
-            except queue.Empty:
-                pass
-            for port in self.links.keys():
-                packet = self.links[port].recv(self.addr)
-                if packet:
-                    self.handlePacket(port, packet)
+            time.sleep(simclock.TICK)
+            self.tick()
+
+
+    def tick(self):
+        """One iteration of the main loop: apply a link change and handle every packet that has arrived"""
+        try:
+            change = self.linkChanges.get_nowait()
+            if change[0] == "add":
+                self.addLink(*change[1:])
+            elif change[0] == "remove":
+                self.removeLink(*change[1:])
+        except queue.Empty:
+            pass
+        for port in list(self.links.keys()):
+            for packet in self.links[port].recvAll(self.addr):
+                self.handlePacket(port, packet)
 
 
     def send(self, port, packet):
@@ -78,25 +117,53 @@ class Router():
             pass
 
 
-    def logRecvdPacket(self, port, outPort, packet, dropped):
-        """Log recvd packets"""
+    def logRecvdPacket(self, port, outPort, packet, dropped, flow=None):
+        """Log recvd packets, counting them for the router and the packet's flow"""
+        size = 10 + len(packet.payload) if packet.payload != None else 10 # 10 bytes for header
         self.recvdPktCnt += 1
-        if packet.payload != None:
-            self.recvdByteCnt += 10 + len(packet.payload) # 10 bytes for header
-        else:
-            self.recvdByteCnt += 10 # 10 bytes for header
+        self.recvdByteCnt += size
+        if dropped:
+            self.droppedPktCnt += 1
+        if flow is not None:
+            flow.recvdPktCnt += 1
+            flow.recvdByteCnt += size
+            if dropped:
+                flow.droppedPktCnt += 1
+
+        if self.log.headers:
+            line = ("Packet " + str(self.recvdPktCnt) + " - " + "srcAddr: " + packet.srcAddr + " dstAddr: " + packet.dstAddr + " seqNum: " + str(packet.seqNum) + " ackNum: " + str(packet.ackNum) + " SYNFLag: " + str(packet.synFlag) + " ACKFlag: " + str(packet.ackFlag) + " FINFlag: " + str(packet.finFlag) + " Received on port: " + str(port) + " Forwarded on port: " + (str(outPort) if dropped == 0 else "DROPPED"))
+            if self.log.full:
+                line += " Payload: " + str(packet.payload)
+            self.log.write(line + "\n")
+
+
+    def closeLog(self):
+        """Write the summary line and close the packet dump"""
+        self.log.close("Summary - received: " + str(self.recvdPktCnt) + " pkts, " + str(self.recvdByteCnt) + " bytes, dropped: " + str(self.droppedPktCnt) + " pkts")
+
+
+    def flowOf(self, packet):
+        """The Flow of 'packet', in either direction. A flow is created by the first packet
+           seen between two addresses, normally the sender's SYN.
+        """
+        flow = self.flows.get((packet.srcAddr, packet.dstAddr)) or self.flows.get((packet.dstAddr, packet.srcAddr))
+        if flow is None:
+            flow = self.flows[(packet.srcAddr, packet.dstAddr)] = Flow(packet.srcAddr, packet.dstAddr)
+        return flow
+
 
-        if dropped == 0:
-            self.f.write("Packet " + str(self.recvdPktCnt) + " - " + "srcAddr: " + packet.srcAddr + " dstAddr: " + packet.dstAddr + " seqNum: " + str(packet.seqNum) + " ackNum: " + str(packet.ackNum) + " SYNFLag: " + str(packet.synFlag) + " ACKFlag: " + str(packet.ackFlag) + " FINFlag: " + str(packet.finFlag) + " Received on port: " + str(port) + " Forwarded on port: " + str(outPort) + " Payload: " + str(packet.payload))
-        else:
-            self.f.write("Packet " + str(self.recvdPktCnt) + " - " + "srcAddr: " + packet.srcAddr + " dstAddr: " + packet.dstAddr + " seqNum: " + str(packet.seqNum) + " ackNum: " + str(packet.ackNum) + " SYNFLag: " + str(packet.synFlag) + " ACKFlag: " + str(packet.ackFlag) + " FINFlag: " + str(packet.finFlag) + " Received on port: " + str(port) + " Forwarded on port: DROPPED" + " Payload: " + str(packet.payload))
-        self.f.write("\n")
+    def route(self, dstAddr):
+        """Port to forward a packet for 'dstAddr' on, or None if there is no route"""
+        return self.ports.get(self.routes.get(dstAddr, dstAddr))
 
 
     def handlePacket(self, port, packet):
         """Process incoming packet.
            This method is called whenever router receives a packet.
-           
+           Connection state is kept per flow, and packets are forwarded by destination address
+           along the routing table. Every router on the path tracks the flows crossing it; the
+           one the sender is attached to ends them for the simulation.
+
            Parameters:
            port : the router port on which the packet was received
            packet : the received packet
@@ -107,47 +174,45 @@ class Router():
         if packet.synFlag == 1 or packet.finFlag == 1: # control packet
             assert(packet.payload == None)
 
+        flow = self.flowOf(packet)
+        mark = MARKS.get(port, "*")
+
         # drop all data packets if connection is not established
-        if self.connEstablished == 0 and packet.payload != None:
-            self.logRecvdPacket(port, None, packet, 1)
-            if port == 1:
-                print("[+] ", end='', flush=True)
-            elif port == 2:
-                print("[@] ", end='', flush=True)
+        if flow.connEstablished == 0 and packet.payload != None:
+            self.logRecvdPacket(port, None, packet, 1, flow)
+            self.log.mark("[" + mark + "] ")
             return
 
         if packet.synFlag == 1: # connection set up phase
-            self.connSetup = 1
+            flow.connSetup = 1
 
         if packet.finFlag == 1: # connection termination phase
-            self.connTerminate = 1
-
-        # forwarding and drop logic
-        r = random.randint(0, 99)
-        if r < self.lossProb and self.connSetup == 0 and self.connTerminate == 0: # drop
-            self.logRecvdPacket(port, None, packet, 1)
-            if port == 1:
-                print("[+] ", end='', flush=True)
-            elif port == 2:
-                print("[@] ", end='', flush=True)
-        else: # forward
-            if port == 1:
-                self.logRecvdPacket(port, 2, packet, 0)
-                self.send(2, packet)
-            elif port == 2:
-                self.logRecvdPacket(port, 1, packet, 0)
-                self.send(1, packet)
-            if port == 1:
-                print("+ ", end='', flush=True)
-            elif port == 2:
-                print("@ ", end='', flush=True)
-
-        if self.connSetup == 1: # connection established
-            if packet.synFlag == 0 and packet.ackFlag == 1:
-                self.connSetup = 0
-                self.connEstablished = 1
+            flow.connTerminate = 1
 
-        if self.connTerminate == 1: # connection terminated
-            if packet.finFlag == 0 and packet.ackFlag == 1:
-                self.endSimulation = 1
+        # forwarding and drop logic: the loss model is only consulted for packets that may be dropped
+        outPort = self.route(packet.dstAddr)
+        if outPort is None or (flow.connSetup == 0 and flow.connTerminate == 0 and self.lossModel.drop()): # drop
+            self.logRecvdPacket(port, None, packet, 1, flow)
+            self.log.mark("[" + mark + "] ")
+        else: # forward
+            self.logRecvdPacket(port, outPort, packet, 0, flow)
+            self.send(outPort, packet)
+            self.log.mark(mark + " ")
 
+        if flow.connSetup == 1: # connection established
+            if packet.synFlag == 0 and packet.ackFlag == 1:
+                flow.connSetup = 0
+                flow.connEstablished = 1
+
+        # connection terminated: the sender's final ACK answers the receiver's FIN-ACK, so the
+        # receiver has seen the FIN. ACKs of the receiver still in flight behind the FIN do not count.
+        if flow.connTerminate == 1 and not flow.done:
+            if packet.finFlag == 0 and packet.ackFlag == 1 and packet.srcAddr == flow.src:
+                flow.done = True
+                flow.endTime = simclock.now()
+                if flow.src in self.ports:
+                    self.finishedFlows += 1
+                if self.finishedFlows >= self.expectedFlows > 0:
+                    self.endSimulation = 1
+                    self.endTime = flow.endTime
+                    self.done.set()
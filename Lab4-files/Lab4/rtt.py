@@ -0,0 +1,70 @@
+import simclock
+
+class RTTEstimator:
+    """Retransmission timeout from measured round-trip times (RFC 6298).
+
+       SRTT and RTTVAR are updated from each valid sample and RTO = SRTT + max(G, K*RTTVAR),
+       where G is the clock granularity (one simulator tick). Callers apply Karn's rule by
+       only sampling segments that were transmitted once. Each timeout doubles the RTO, at
+       most 'maxBackoff' times over and up to 'maxRTO'; a new sample or an ACK for new data
+       clears the backoff.
+    """
+
+    ALPHA = 1.0 / 8
+    BETA = 1.0 / 4
+    K = 4
+
+    def __init__(self, initialRTO=2.0, minRTO=1.0, maxRTO=60.0, maxBackoff=64, granularity=simclock.TICK):
+        self.srtt = None        # smoothed round-trip time (seconds)
+        self.rttvar = None      # round-trip time variation (seconds)
+        self.rto = initialRTO   # timeout before backoff
+        self.minRTO = minRTO
+        self.maxRTO = maxRTO
+        self.maxBackoff = maxBackoff
+        self.granularity = granularity
+        self.backoff = 1        # multiplier applied after consecutive timeouts
+        self.samples = 0
+        self.timeouts = 0
+
+
+    def sample(self, rtt):
+        """Update the estimate with a round-trip time measured on a segment sent only once"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2.0
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.rto = min(self.maxRTO, max(self.minRTO, self.srtt + max(self.granularity, self.K * self.rttvar)))
+        self.backoff = 1
+        self.samples += 1
+
+
+    def timedOut(self):
+        """A retransmission timer expired: back off"""
+        self.timeouts += 1
+        if self.backoff < self.maxBackoff and self.rto * self.backoff < self.maxRTO:
+            self.backoff *= 2
+
+
+    def acked(self):
+        """New data was acknowledged, so the path works again: clear the backoff"""
+        self.backoff = 1
+
+
+    def getRTO(self):
+        """Current retransmission timeout in seconds"""
+        return min(self.maxRTO, self.rto * self.backoff)
+
+
+    def getState(self):
+        """Estimator state as a dict, for logging"""
+        return {"srtt": self.srtt, "rttvar": self.rttvar, "rto": self.getRTO(),
+                "backoff": self.backoff, "samples": self.samples, "timeouts": self.timeouts}
+
+
+    def getStateString(self):
+        state = self.getState()
+        fmt = lambda v: "-" if v is None else str(round(v, 3))
+        return ("srtt: " + fmt(state["srtt"]) + " rttvar: " + fmt(state["rttvar"]) + " rto: " + fmt(state["rto"]) +
+                " backoff: " + str(state["backoff"]) + " samples: " + str(state["samples"]) + " timeouts: " + str(state["timeouts"]))
@@ -1,9 +1,18 @@
 #!/usr/bin/env python3
 import subprocess
+import sys
+import os
 import re
 import csv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from benchStats import median, percentile, median_ci, mann_whitney, min_p_value
 
 # -------------------------------------------------------------------
 #  Baseline numbers from the handout (previous-year baselines)
@@ -45,10 +54,42 @@ BASELINES = {
 FILES = ["file1.txt", "file2.txt", "file3.txt", "file4.txt", "file5.txt"]
 LOSSES = [10, 30, 50, 70, 90]
 
-NETWORK_CMD = ["python3", "network.py"]  # you can change to ["python", ...] if needed
-JSON_CONFIG = "01.json"
+ROOT = Path(__file__).resolve().parent  # the Lab4 directory: network.py, 01.json and sendfiles/
+NETWORK_CMD = [sys.executable, str(ROOT / "network.py")]
+JSON_CONFIG = ROOT / "01.json"
 
-MAX_WORKERS = 4  # how many runs in parallel (tune as you like)
+# -------------------------------------------------------------------
+#  Every run goes to its own scratch directory: network.py writes its
+#  packet dumps to logs/ under the current directory, so runs that share
+#  a directory overwrite each other's dumps. Runs go to a process pool,
+#  longest baseline first so the slow ones do not start last.
+#
+#  Each case runs once per seed (network.py --seed), and the report gives
+#  the median, p95 and a 95% confidence interval of the median. Samples are
+#  appended to a history file, and a case is flagged as a regression when a
+#  one-sided Mann-Whitney test says its times or bytes went up compared to
+#  the last stored run with the same network.py arguments. The test needs
+#  4 seeds on both sides to reach ALPHA (exact p = 1/70; 3 give 1/20); with
+#  fewer a warning is printed.
+# -------------------------------------------------------------------
+MAX_WORKERS = os.cpu_count() or 4
+TIMEOUT = 1800              # seconds of wall time per run
+REPORT = "results"          # writes results.csv and results.json
+HISTORY = "bench_history.jsonl"
+SEEDS = 4                   # runs per case: the fewest for which the regression test can reach ALPHA
+ALPHA = 0.05                # significance level of the regression test
+
+CSV_FIELDS = [
+    "file", "loss", "success",
+    "total_time", "base_time", "time_ratio",
+    "total_bytes", "base_bytes", "byte_ratio",
+    "perf_points", "bonus", "total_points",
+    "status", "wall_time",
+    "runs", "passed",
+    "time_p95", "time_ci_low", "time_ci_high",
+    "bytes_p95", "bytes_ci_low", "bytes_ci_high",
+    "regression", "time_p_value", "bytes_p_value",
+]
 
 
 def parse_stats(output: str):
@@ -101,135 +142,295 @@ def bonus_point(byte_ratio: float, time_ratio: float) -> int:
     return 1 if (byte_ratio <= 1.25 and time_ratio <= 1.5) else 0
 
 
-def run_single_test(filename: str, loss: int):
+def run_single_test(filename: str, loss: int, seed: int, extra_args: list, timeout: float, keep: bool):
     """
-    Run one test case:
-      python3 network.py 01.json sendfiles/FILE recvfiles/FILE_lossXX.txt loss
-    Return a dict with all relevant stats.
+    Run one test case with one seed in a fresh working directory:
+      python3 network.py 01.json sendfiles/FILE <run dir>/FILE.recv loss --seed SEED [extra_args]
+    Return a dict with the run's results. 'status' is OK, FAIL (the files
+    differ), TIMEOUT, ERROR (non-zero exit) or PARSE_ERROR.
     """
-    send_path = Path("sendfiles") / filename
-    recv_path = Path("recvfiles") / f"{filename}_loss{loss}.recv"
-
-    cmd = NETWORK_CMD + [JSON_CONFIG, str(send_path), str(recv_path), str(loss)]
-
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    case_dir = Path(tempfile.mkdtemp(prefix=f"{filename}_loss{loss}_seed{seed}_"))
+    (case_dir / "logs").mkdir()
+    send_path = ROOT / "sendfiles" / filename
+    recv_path = case_dir / f"{filename}.recv"
 
-    stdout = result.stdout
-    stderr = result.stderr
+    cmd = NETWORK_CMD + [str(JSON_CONFIG), str(send_path), str(recv_path), str(loss), "--seed", str(seed)] + extra_args
 
+    result = {"file": filename, "loss": loss, "seed": seed, "success": False}
+    started = time.monotonic()
+    try:
+        proc = subprocess.run(cmd, cwd=case_dir, capture_output=True, text=True, timeout=timeout)
+        stdout, stderr, returncode = proc.stdout, proc.stderr, proc.returncode
+    except subprocess.TimeoutExpired as e:
+        # the partial output comes back as bytes even in text mode
+        stdout, stderr, returncode = e.stdout or b"", e.stderr or b"", None
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode(errors="replace")
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode(errors="replace")
+    result["wall_time"] = time.monotonic() - started
+    result["stdout"], result["stderr"] = stdout, stderr
+
+    if keep:
+        result["case_dir"] = str(case_dir)
+    else:
+        shutil.rmtree(case_dir, ignore_errors=True)
+
+    if returncode is None:
+        result["status"] = "TIMEOUT"
+        return result
+    if returncode != 0:
+        result["status"] = "ERROR"
+        return result
     try:
         total_time, total_bytes, success = parse_stats(stdout)
-    except Exception as e:
-        # On parse failure, report something obvious
-        return {
-            "file": filename,
-            "loss": loss,
-            "success": False,
-            "parse_error": str(e),
-            "stdout": stdout,
-            "stderr": stderr,
-        }
+    except ValueError as e:
+        result["status"] = "PARSE_ERROR"
+        result["parse_error"] = str(e)
+        return result
 
-    base = BASELINES[(filename, loss)]
-    base_time = base["time"]
-    base_bytes = base["bytes"]
+    result.update({"success": success, "status": "OK" if success else "FAIL",
+                   "total_time": total_time, "total_bytes": total_bytes})
+    return result
 
-    time_ratio = total_time / base_time
-    byte_ratio = total_bytes / base_bytes
+
+def summarize_case(filename: str, loss: int, runs: list) -> dict:
+    """
+    Combine the runs of one case. Times and bytes are the medians of the runs that
+    finished (OK or FAIL); the case succeeds, and is scored, only if every run did.
+    """
+    runs = sorted(runs, key=lambda r: r["seed"])
+    finished = [r for r in runs if "total_time" in r]
+    passed = sum(r["status"] == "OK" for r in runs)
+    failed = [r["status"] for r in runs if r["status"] != "OK"]
+    case = {
+        "file": filename,
+        "loss": loss,
+        "success": not failed,
+        "status": "OK" if not failed else max(set(failed), key=failed.count),
+        "runs": len(runs),
+        "passed": passed,
+        "wall_time": sum(r["wall_time"] for r in runs),
+        "seeds": [r["seed"] for r in runs],
+        "times": [r["total_time"] for r in finished],
+        "bytes": [r["total_bytes"] for r in finished],
+        "failures": [{k: r[k] for k in ("seed", "status", "stdout", "stderr")} for r in runs if r["status"] != "OK"],
+    }
+    if not finished:
+        return case
+
+    base = BASELINES[(filename, loss)]
+    case.update({
+        "total_time": median(case["times"]),
+        "time_p95": percentile(case["times"], 95),
+        "time_ci": median_ci(case["times"]),
+        "total_bytes": median(case["bytes"]),
+        "bytes_p95": percentile(case["bytes"], 95),
+        "bytes_ci": median_ci(case["bytes"]),
+        "base_time": base["time"],
+        "base_bytes": base["bytes"],
+    })
+    case["time_ratio"] = case["total_time"] / case["base_time"]
+    case["byte_ratio"] = case["total_bytes"] / case["base_bytes"]
 
     # 70% for correctness if SUCCESS, else 0
-    correctness_points = 70 if success else 0
+    correctness_points = 70 if case["success"] else 0
 
-    perf_points = performance_credit(byte_ratio, time_ratio) if success else 0
-    bonus = bonus_point(byte_ratio, time_ratio) if success else 0
+    case["perf_points"] = performance_credit(case["byte_ratio"], case["time_ratio"]) if case["success"] else 0
+    case["bonus"] = bonus_point(case["byte_ratio"], case["time_ratio"]) if case["success"] else 0
+    case["total_points"] = correctness_points + case["perf_points"] + case["bonus"]
+    return case
 
-    total_points = correctness_points + perf_points + bonus
 
-    return {
-        "file": filename,
-        "loss": loss,
-        "success": success,
-        "total_time": total_time,
-        "total_bytes": total_bytes,
-        "base_time": base_time,
-        "base_bytes": base_bytes,
-        "time_ratio": time_ratio,
-        "byte_ratio": byte_ratio,
-        "perf_points": perf_points,
-        "bonus": bonus,
-        "total_points": total_points,
-        "stdout": stdout,
-        "stderr": stderr,
+def case_key(case: dict) -> str:
+    return f"{case['file']}@{case['loss']}"
+
+
+def load_previous(history: str, extra_args: list):
+    """Last entry of the history file that ran network.py with the same arguments, or None"""
+    previous = None
+    try:
+        with open(history) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    if entry["args"] == extra_args:
+                        previous = entry
+    except FileNotFoundError:
+        pass
+    return previous
+
+
+def flag_regressions(cases: list, previous: dict, alpha: float = ALPHA):
+    """
+    Compare every case with its samples in the 'previous' history entry: the case is a
+    regression in time (bytes) when the current times (bytes) are significantly larger.
+    """
+    for case in cases:
+        case["regression"] = ""
+        before = previous["cases"].get(case_key(case)) if previous else None
+        if not before or not case["times"]:
+            continue
+        flags = []
+        for metric, label in (("times", "time"), ("bytes", "bytes")):
+            p = mann_whitney(case[metric], before[metric])
+            case[label + "_p_value"] = p
+            if p < alpha and median(case[metric]) > median(before[metric]):
+                flags.append(label)
+        case["regression"] = "+".join(flags)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def append_history(history: str, cases: list, extra_args: list, seeds: list):
+    entry = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "args": extra_args,
+        "seeds": seeds,
+        "cases": {case_key(c): {"times": c["times"], "bytes": c["bytes"], "passed": c["passed"], "runs": c["runs"]}
+                  for c in cases},
+    }
+    with open(history, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def csv_row(c: dict) -> dict:
+    """One results.csv row; cases without a finished run get empty cells"""
+    row = {k: "" for k in CSV_FIELDS}
+    row.update({"file": c["file"], "loss": c["loss"], "success": c["success"], "status": c["status"],
+                "wall_time": f"{c['wall_time']:.1f}", "runs": c["runs"], "passed": c["passed"],
+                "perf_points": 0, "bonus": 0, "total_points": 0, "regression": c.get("regression", "")})
+    if "total_time" in c:
+        row.update({
+            "total_time": f"{c['total_time']:.3f}",
+            "base_time": f"{c['base_time']:.3f}",
+            "time_ratio": f"{c['time_ratio']:.3f}",
+            "total_bytes": c["total_bytes"],
+            "base_bytes": c["base_bytes"],
+            "byte_ratio": f"{c['byte_ratio']:.3f}",
+            "perf_points": c["perf_points"],
+            "bonus": c["bonus"],
+            "total_points": c["total_points"],
+            "time_p95": f"{c['time_p95']:.3f}",
+            "time_ci_low": f"{c['time_ci'][0]:.3f}",
+            "time_ci_high": f"{c['time_ci'][1]:.3f}",
+            "bytes_p95": f"{c['bytes_p95']:.0f}",
+            "bytes_ci_low": c["bytes_ci"][0],
+            "bytes_ci_high": c["bytes_ci"][1],
+        })
+    for label in ("time", "bytes"):
+        if label + "_p_value" in c:
+            row[label + "_p_value"] = f"{c[label + '_p_value']:.4f}"
+    return row
+
+
+def write_report(cases: list, prefix: str, extra_args: list, seeds: list, previous: dict):
+    """Write <prefix>.csv (one row per case) and <prefix>.json (cases with their samples,
+       the run settings, and the output of the runs that did not succeed)"""
+    cases = sorted(cases, key=lambda x: (x["file"], x["loss"]))
+    with open(prefix + ".csv", "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for c in cases:
+            writer.writerow(csv_row(c))
+
+    for c in cases:
+        for failure in c["failures"]:
+            failure["stdout"], failure["stderr"] = failure["stdout"][-2000:], failure["stderr"][-2000:]
+    report = {
+        "args": extra_args,
+        "seeds": seeds,
+        "compared_to": {"date": previous["date"], "commit": previous["commit"]} if previous else None,
+        "passed": sum(c["success"] for c in cases),
+        "bonus": sum(c.get("bonus", 0) for c in cases),
+        "total_points": sum(c.get("total_points", 0) for c in cases),
+        "regressions": [case_key(c) + " " + c["regression"] for c in cases if c.get("regression")],
+        "cases": cases,
     }
+    with open(prefix + ".json", "w") as jsonfile:
+        json.dump(report, jsonfile, indent=2)
 
 
-def main():
-    Path("recvfiles").mkdir(exist_ok=True)
+def print_summary(cases: list):
+    print(f"\n{'File':<10} {'Loss':<5} {'Status':<8} {'Runs':>5} {'Time(s)':>9} {'95% CI':>19} {'p95':>9} "
+          f"{'Bytes':>9} {'p95':>9} {'Bytes x':>7} {'Time x':>7}  Bonus  Regression")
+    for c in sorted(cases, key=lambda x: (x["file"], x["loss"])):
+        line = f"{c['file']:<10} {str(c['loss']) + '%':<5} {c['status']:<8} {str(c['passed']) + '/' + str(c['runs']):>5}"
+        if "total_time" in c:
+            ci = f"[{c['time_ci'][0]:.1f}, {c['time_ci'][1]:.1f}]"
+            line += (f" {c['total_time']:>9.1f} {ci:>19} {c['time_p95']:>9.1f} {c['total_bytes']:>9.0f} {c['bytes_p95']:>9.0f}"
+                     f" {c['byte_ratio']:>7.3f} {c['time_ratio']:>7.3f}  {'BONUS' if c['bonus'] else '':<5}  {c.get('regression', '')}")
+        print(line)
+    print(f"\nPassed: {sum(c['success'] for c in cases)}/{len(cases)}, "
+          f"bonus-qualified: {sum(c.get('bonus', 0) for c in cases)}/{len(cases)}")
 
-    tests = [(f, p) for f in FILES for p in LOSSES]
-    results = []
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+def main():
+    parser = argparse.ArgumentParser(allow_abbrev=False,
+                                     description="Run the Lab4 benchmark matrix. Unrecognized arguments "
+                                                 "(e.g. --virtual) are passed on to network.py.")
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS, help=f"runs in parallel (default: {MAX_WORKERS})")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help=f"wall-clock seconds per run (default: {TIMEOUT})")
+    parser.add_argument("--report", default=REPORT, help=f"report path without extension (default: {REPORT})")
+    parser.add_argument("--files", nargs="+", default=FILES, choices=FILES, metavar="FILE", help="send files to run (default: all)")
+    parser.add_argument("--losses", nargs="+", type=int, default=LOSSES, choices=LOSSES, metavar="LOSS", help="loss rates to run (default: all)")
+    parser.add_argument("--keep", action="store_true", help="keep each run's working directory (logs and received file)")
+    parser.add_argument("--seeds", type=int, default=SEEDS, help=f"runs per case, with seeds --seed-base, --seed-base+1, ... (default: {SEEDS})")
+    parser.add_argument("--seed-base", type=int, default=1, help="first seed (default: 1)")
+    parser.add_argument("--history", default=HISTORY, help=f"results history, appended to and compared against (default: {HISTORY})")
+    parser.add_argument("--no-history", action="store_true", help="neither compare with nor append to the history")
+    args, extra_args = parser.parse_known_args()
+    if "--seed" in extra_args:
+        parser.error("seeds are set by the harness, use --seeds/--seed-base")
+    seeds = list(range(args.seed_base, args.seed_base + args.seeds))
+    previous = None if args.no_history else load_previous(args.history, extra_args)
+    if not args.no_history:
+        before = len(previous["seeds"]) if previous else len(seeds)
+        if min_p_value(len(seeds), before) >= ALPHA:
+            print(f"WARNING: {len(seeds)} seed(s) against {before} in the history cannot reach p < {ALPHA}: "
+                  f"regressions are only detected once both runs have {SEEDS} or more", flush=True)
+
+    # longest baseline first, so the pool is not left waiting on one slow case at the end
+    tests = sorted(((f, p) for f in args.files for p in args.losses), key=lambda t: -BASELINES[t]["time"])
+    runs = {t: [] for t in tests}
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
         future_to_test = {
-            executor.submit(run_single_test, f, p): (f, p)
-            for f, p in tests
+            executor.submit(run_single_test, f, p, seed, extra_args, args.timeout, args.keep): (f, p)
+            for f, p in tests for seed in seeds
         }
 
         for future in as_completed(future_to_test):
             f, p = future_to_test[future]
-            try:
-                res = future.result()
-                results.append(res)
-                status = "OK" if res.get("success") else "FAIL"
-                print(f"[{status}] {f} @ {p}% loss")
-            except Exception as e:
-                print(f"[ERROR] {f} @ {p}% loss: {e}")
-
-    # Dump to CSV
-    with open("results.csv", "w", newline="") as csvfile:
-        fieldnames = [
-            "file", "loss", "success",
-            "total_time", "base_time", "time_ratio",
-            "total_bytes", "base_bytes", "byte_ratio",
-            "perf_points", "bonus", "total_points"
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for r in sorted(results, key=lambda x: (x["file"], x["loss"])):
-            if "parse_error" in r:
-                # If parsing failed, just mark as failure with NaNs
-                writer.writerow({
-                    "file": r["file"],
-                    "loss": r["loss"],
-                    "success": False,
-                    "total_time": "PARSE_ERROR",
-                    "base_time": "",
-                    "time_ratio": "",
-                    "total_bytes": "",
-                    "base_bytes": "",
-                    "byte_ratio": "",
-                    "perf_points": 0,
-                    "bonus": 0,
-                    "total_points": 0,
-                })
-            else:
-                writer.writerow({
-                    "file": r["file"],
-                    "loss": r["loss"],
-                    "success": r["success"],
-                    "total_time": f"{r['total_time']:.3f}",
-                    "base_time": f"{r['base_time']:.3f}",
-                    "time_ratio": f"{r['time_ratio']:.3f}",
-                    "total_bytes": r["total_bytes"],
-                    "base_bytes": r["base_bytes"],
-                    "byte_ratio": f"{r['byte_ratio']:.3f}",
-                    "perf_points": r["perf_points"],
-                    "bonus": r["bonus"],
-                    "total_points": r["total_points"],
-                })
-
-    print("\nWrote results to results.csv")
-    print("Columns: file, loss, success, times/bytes, ratios, perf_points, bonus, total_points")
+            res = future.result()
+            runs[(f, p)].append(res)
+            print(f"[{res['status']}] {f} @ {p}% loss, seed {res['seed']} ({res['wall_time']:.1f} s)" +
+                  (f" in {res['case_dir']}" if args.keep else ""), flush=True)
+
+    cases = [summarize_case(f, p, runs[(f, p)]) for f, p in tests]
+    flag_regressions(cases, previous)
+
+    print_summary(cases)
+    write_report(cases, args.report, extra_args, seeds, previous)
+    print(f"\nWrote results to {args.report}.csv and {args.report}.json")
+    if not args.no_history:
+        append_history(args.history, cases, extra_args, seeds)
+
+    regressions = [c for c in cases if c["regression"]]
+    if previous:
+        print(f"Compared with the run of {previous['date']} ({previous['commit'] or 'unknown commit'}): "
+              f"{len(regressions)} regression(s)")
+        for c in regressions:
+            print(f"  REGRESSION {case_key(c)}: {c['regression']}")
+    if regressions:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+def encodeRanges(cumAck, ranges, maxLen):
+    """SACK payload for the received ranges [start, end) above 'cumAck', in the given order.
+       Each range is written as "<start - cumAck>+<length>", comma separated, keeping as many
+       ranges as fit in 'maxLen' characters. Returns None if there is nothing to report.
+    """
+    text = ""
+    for start, end in ranges:
+        block = str(start - cumAck) + "+" + str(end - start)
+        if len(text) + len(block) + (1 if text else 0) > maxLen:
+            break
+        text = text + "," + block if text else block
+    return text or None
+
+
+def decodeRanges(cumAck, payload):
+    """Inverse of encodeRanges: list of (start, end)"""
+    ranges = []
+    if payload:
+        for block in payload.split(","):
+            offset, length = block.split("+")
+            start = cumAck + int(offset)
+            ranges.append((start, start + int(length)))
+    return ranges
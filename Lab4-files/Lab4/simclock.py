@@ -0,0 +1,39 @@
+import time
+
+TICK = 0.1      # seconds between two runs of a router/client main loop
+
+
+class Clock:
+    """Wall clock: the default, threaded simulation runs in real time"""
+
+    virtual = False
+
+    def time(self):
+        return time.time()
+
+
+class VirtualClock(Clock):
+    """Simulated clock, advanced by the discrete-event engine in network.py"""
+
+    virtual = True
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+clock = Clock()
+
+
+def now():
+    """Current time in seconds on the active clock. Use this instead of time.time()"""
+    return clock.time()
+
+
+def useVirtualClock():
+    """Switch links, routers and clients to simulated time. Returns the VirtualClock"""
+    global clock
+    clock = VirtualClock()
+    return clock
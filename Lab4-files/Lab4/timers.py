@@ -0,0 +1,50 @@
+import heapq
+
+class Segment:
+    """Sender state of one data segment. The payload is rebuilt from 'seq' when it is re-sent"""
+
+    __slots__ = ("seq", "time", "sends", "acked")
+
+    def __init__(self, seq, time):
+        self.seq = seq
+        self.time = time        # time of the last (re)transmission
+        self.sends = 1          # number of transmissions so far
+        self.acked = False
+
+
+class TimerHeap:
+    """Retransmission timers of all unacked segments in a min-heap keyed by send time.
+
+       All segments share one RTO, so the segment sent first is always the first to expire
+       and the RTO can change between calls. Entries are not removed when a segment is acked
+       or re-sent; they are skipped when they reach the top (lazy deletion), so per-tick work
+       is proportional to the number of expired and stale timers only.
+    """
+
+    def __init__(self):
+        self.heap = []          # (send time, seq, sends, segment)
+
+
+    def start(self, seg):
+        """(Re)start the timer of 'seg' from its current send time"""
+        heapq.heappush(self.heap, (seg.time, seg.seq, seg.sends, seg))
+
+
+    def expired(self, now, rto):
+        """Pop and return the unacked segments with now - send time > rto, oldest first"""
+        heap = self.heap
+        segs = []
+        while heap:
+            sendTime, seq, sends, seg = heap[0]
+            if seg.acked or sends != seg.sends:
+                heapq.heappop(heap)     # stale: acked or re-sent since this entry was pushed
+                continue
+            if now - sendTime <= rto:
+                break
+            heapq.heappop(heap)
+            segs.append(seg)
+        return segs
+
+
+    def __len__(self):
+        return len(self.heap)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import csv
+import json
+import math
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from runBenchmarks import BASELINES, FILES, LOSSES, MAX_WORKERS, TIMEOUT, run_single_test, summarize_case
+
+# -------------------------------------------------------------------
+#  Parameter sweep of the MyClient knobs over the benchmark matrix, on
+#  the simulated clock. Every combination of the GRID values runs every
+#  (file, loss) case once per seed; cases are scored like runBenchmarks.py
+#  (medians over the seeds). The report gives
+#    - the Pareto frontier of the settings: geometric mean time ratio vs
+#      byte ratio over the matrix, for settings that pass every case,
+#    - per loss level, the settings with the most performance credit and
+#      bonus points summed over the files (ties: lower mean time ratio).
+#
+#  Usage: python tuneClient.py [--grid min-rto=0.5,1,2 ...] [--files ...]
+#         [--losses ...] [--seeds N] [--jobs N] [--report PREFIX]
+# -------------------------------------------------------------------
+GRID = {
+    "window": ["fixed", "aimd", "lossrate"],
+    "window-size": ["10", "20", "40"],
+    "fec": ["", "xor"],         # "" leaves the option out
+    "compress": ["", "zlib"],
+}
+BASE_ARGS = ["--virtual", "--log", "off"]
+REPORT = "tune"                 # writes tune.csv and tune.json
+
+
+def parse_grid(specs: list) -> dict:
+    """GRID with the 'name=v1,v2,...' specs applied; a spec replaces or adds one network.py option"""
+    grid = dict(GRID)
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if not name or not values:
+            raise ValueError("Expected name=value[,value...], got " + repr(spec))
+        grid[name.lstrip("-")] = values.split(",")
+    return grid
+
+
+def configurations(grid: dict) -> list:
+    """Every combination of the grid values, as {option name: value}"""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def config_args(config: dict) -> list:
+    args = []
+    for name, value in sorted(config.items()):
+        if value != "":
+            args += ["--" + name, value]
+    return args
+
+
+def config_label(config: dict) -> str:
+    return " ".join(f"{name}={value or '-'}" for name, value in sorted(config.items()))
+
+
+def geomean(values: list) -> float:
+    return math.exp(sum(math.log(v) for v in values) / len(values))
+
+
+def pareto(points: list) -> list:
+    """The (label, time, bytes) points that no other point beats on both time and bytes, by time"""
+    frontier = []
+    for p in sorted(points, key=lambda p: (p[1], p[2])):
+        if not frontier or p[2] < frontier[-1][2]:
+            frontier.append(p)
+    return frontier
+
+
+def score(label: str, cases: list) -> dict:
+    """Totals of one setting over a set of cases"""
+    finished = [c for c in cases if "total_time" in c]
+    return {
+        "label": label,
+        "passed": sum(c["success"] for c in cases),
+        "cases": len(cases),
+        "points": sum(c.get("perf_points", 0) + c.get("bonus", 0) for c in cases),
+        "bonus": sum(c.get("bonus", 0) for c in cases),
+        "time_ratio": geomean([c["time_ratio"] for c in finished]) if finished else float("inf"),
+        "byte_ratio": geomean([c["byte_ratio"] for c in finished]) if finished else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(allow_abbrev=False, description="Sweep MyClient settings over the benchmark matrix.")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                        help="values of a network.py option to sweep, replacing its default values (repeatable)")
+    parser.add_argument("--files", nargs="+", default=FILES, choices=FILES, metavar="FILE", help="send files to run (default: all)")
+    parser.add_argument("--losses", nargs="+", type=int, default=LOSSES, choices=LOSSES, metavar="LOSS", help="loss rates to run (default: all)")
+    parser.add_argument("--seeds", type=int, default=1, help="runs per case and setting (default: 1)")
+    parser.add_argument("--seed-base", type=int, default=1, help="first seed (default: 1)")
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS, help=f"runs in parallel (default: {MAX_WORKERS})")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help=f"wall-clock seconds per run (default: {TIMEOUT})")
+    parser.add_argument("--report", default=REPORT, help=f"report path without extension (default: {REPORT})")
+    args = parser.parse_args()
+    try:
+        grid = parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+
+    configs = configurations(grid)
+    seeds = list(range(args.seed_base, args.seed_base + args.seeds))
+    # longest baseline first, so the pool is not left waiting on slow cases at the end
+    tests = sorted(((f, p) for f in args.files for p in args.losses), key=lambda t: -BASELINES[t]["time"])
+    jobs = [(i, f, p, seed) for f, p in tests for i in range(len(configs)) for seed in seeds]
+    print(f"{len(configs)} settings x {len(tests)} cases x {len(seeds)} seed(s) = {len(jobs)} runs", flush=True)
+
+    runs = {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            executor.submit(run_single_test, f, p, seed, BASE_ARGS + config_args(configs[i]), args.timeout, False): (i, f, p)
+            for i, f, p, seed in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            res = future.result()
+            res["stdout"], res["stderr"] = res["stdout"][-2000:], res["stderr"][-2000:]
+            runs.setdefault(futures[future], []).append(res)
+            if done % 50 == 0 or done == len(jobs):
+                print(f"  {done}/{len(jobs)} runs done", flush=True)
+
+    cases = {(i, f, p): summarize_case(f, p, r) for (i, f, p), r in runs.items()}
+    labels = [config_label(c) for c in configs]
+    overall = [score(labels[i], [cases[(i, f, p)] for f, p in tests]) for i in range(len(configs))]
+    passing = [s for s in overall if s["passed"] == s["cases"]]
+    frontier = pareto([(s["label"], s["time_ratio"], s["byte_ratio"]) for s in passing])
+
+    print(f"\nPareto frontier over {len(tests)} cases ({len(passing)}/{len(configs)} settings pass every case):")
+    print(f"{'Time x':>8} {'Bytes x':>8} {'Points':>7}  Settings")
+    for label, t, b in frontier:
+        s = next(s for s in overall if s["label"] == label)
+        print(f"{t:>8.3f} {b:>8.3f} {s['points']:>7}  {label}")
+
+    best = {}
+    print(f"\nBest settings per loss level (performance credit + bonus summed over {len(args.files)} file(s)):")
+    print(f"{'Loss':<6} {'Points':>7} {'Bonus':>6} {'Time x':>8} {'Bytes x':>8}  Settings")
+    for loss in sorted(args.losses):
+        level = [score(labels[i], [cases[(i, f, loss)] for f in args.files]) for i in range(len(configs))]
+        top = min(level, key=lambda s: (s["passed"] < s["cases"], -s["points"], s["time_ratio"]))
+        best[loss] = top
+        print(f"{str(loss) + '%':<6} {top['points']:>7} {top['bonus']:>6} {top['time_ratio']:>8.3f} {top['byte_ratio']:>8.3f}  {top['label']}")
+
+    with open(args.report + ".csv", "w", newline="") as csvfile:
+        fields = ["settings", "file", "loss", "success", "total_time", "total_bytes", "time_ratio", "byte_ratio",
+                  "perf_points", "bonus", "total_points"]
+        writer = csv.DictWriter(csvfile, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for (i, f, p), c in sorted(cases.items()):
+            writer.writerow(dict(c, settings=labels[i]))
+    with open(args.report + ".json", "w") as jsonfile:
+        json.dump({
+            "grid": grid,
+            "base_args": BASE_ARGS,
+            "seeds": seeds,
+            "settings": overall,
+            "frontier": [label for label, _, _ in frontier],
+            "best_per_loss": best,
+        }, jsonfile, indent=2)
+    print(f"\nWrote {args.report}.csv and {args.report}.json")
+
+
+if __name__ == "__main__":
+    main()